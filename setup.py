@@ -11,4 +11,5 @@ setup(
     url="https://github.com/mushorg/snare",
     packages=find_packages(exclude=["*.pyc"]),
     scripts=["./bin/snare", "./bin/clone"],
+    extras_require={"brotli": ["brotli"]},
 )
@@ -0,0 +1,326 @@
+"""
+End-to-end load benchmark of the snare server.
+
+snare and the stub TANNER run in processes of their own, the load generator keeps a fixed number of
+requests in flight and reports req/s, latency percentiles and the RSS of the snare process as JSON.
+
+    python3 -m snare.benchmarks.load --duration 10 --concurrency 32 --output result.json
+    python3 -m snare.benchmarks.load --baseline
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+import aiohttp
+
+from snare.server import HttpRequestHandler
+from snare.utils.tanner_stub import TannerStub
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# name, method, paths, request body, dorks enabled, stub detection mix
+Workload = namedtuple("Workload", ["name", "method", "paths", "body", "dorks", "detections"])
+
+WORKLOADS = (
+    Workload("static", "GET", ("/style.css", "/app.js", "/about.html"), None, False, {1: 1}),
+    Workload("dorks", "GET", ("/index.html",), None, True, {1: 1}),
+    Workload("payload", "GET", ("/index.html?q=<script>alert(1)</script>",), None, False, {2: 1}),
+    Workload("not_found", "GET", ("/missing/{}",), None, False, {1: 1}),
+    Workload("post", "POST", ("/login.html",), b"username=admin&password=" + b"x" * 512, False, {1: 1}),
+)
+
+
+def create_site(path, page_size=32 * 1024):
+    """Writes a cloned site with static assets and HTML pages of about page_size bytes"""
+    paragraphs = "".join(
+        "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit {0}</p><a href='/page/{0}.html'>{0}</a>".format(idx)
+        for idx in range(page_size // 100)
+    )
+    html = "<html><head><title>bench</title></head><body>{}</body></html>".format(paragraphs).encode()
+    pages = {
+        "/index.html": ("index_hash", "text/html", html),
+        "/about.html": ("about_hash", "text/html", html[: page_size // 4]),
+        "/login.html": ("login_hash", "text/html", html[: page_size // 4]),
+        "/style.css": ("css_hash", "text/css", b"body { margin: 0; padding: 0 }\n" * (page_size // 32)),
+        "/app.js": ("js_hash", "application/javascript", b"var snare = function() { return 1 };\n" * 256),
+        "/status_404": ("404_hash", "text/html", b"<html><body>Not Found</body></html>"),
+    }
+    meta = {}
+    for name, (file_name, content_type, content) in pages.items():
+        with open(os.path.join(path, file_name), "wb") as fh:
+            fh.write(content)
+        meta[name] = {"hash": file_name, "headers": [{"Content-Type": content_type}]}
+    with open(os.path.join(path, "meta.json"), "w") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+def create_run_args(page_path, tanner_port, dorks):
+    args = argparse.Namespace(
+        full_page_path=page_path,
+        tanner="127.0.0.1",
+        tanner_port=tanner_port,
+        no_dorks=not dorks,
+        index_page="/index.html",
+        host_ip="127.0.0.1",
+        port=0,
+        server_header=None,
+        slurp_enabled=False,
+    )
+    return args
+
+
+def serve(conn, start_server):
+    """Runs a server coroutine in a fresh loop and sends its port to the parent, until SIGTERM"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    stop = loop.run_until_complete(start_server(conn))
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(stop())
+        loop.close()
+
+
+def start_tanner(detections, latency):
+    async def start_server(conn):
+        stub = TannerStub(latency=latency, detections=detections, seed=1)
+        await stub.start("127.0.0.1", 0)
+        conn.send(stub.port)
+        return stub.stop
+
+    return start_server
+
+
+def start_snare(run_args, meta):
+    async def start_server(conn):
+        handler = HttpRequestHandler(meta, run_args, b"9c10172f-7ce2-4fb4-b1c6-abc70141db56")
+        await handler.start()
+        conn.send(handler.runner.addresses[0][1])
+        return handler.stop
+
+    return start_server
+
+
+def start_process(start_server):
+    context = multiprocessing.get_context("fork")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=serve, args=(child_conn, start_server), daemon=True)
+    process.start()
+    if not parent_conn.poll(30):
+        process.terminate()
+        raise RuntimeError("benchmark server did not start")
+    return process, parent_conn.recv()
+
+
+def stop_process(process):
+    process.terminate()
+    process.join(10)
+    if process.is_alive():
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+
+def rss_kb(pid):
+    """Resident set size of a process in KB, None where /proc is not available"""
+    try:
+        with open("/proc/{}/status".format(pid)) as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+async def generate_load(workload, port, concurrency, duration, requests):
+    """Keeps concurrency requests in flight until duration seconds passed or requests were sent"""
+    latencies = []
+    statuses = Counter()
+    errors = 0
+    sent = 0
+    base_url = "http://127.0.0.1:{}".format(port)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    deadline = time.perf_counter() + duration
+
+    async def client(session):
+        nonlocal errors, sent
+        while time.perf_counter() < deadline and (not requests or sent < requests):
+            path = workload.paths[sent % len(workload.paths)].format(sent)
+            sent += 1
+            start = time.perf_counter()
+            try:
+                async with session.request(workload.method, base_url + path, data=workload.body) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(
+        connector=connector, headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return dict(
+        requests=len(latencies),
+        errors=errors,
+        statuses={str(status): count for status, count in sorted(statuses.items())},
+        elapsed=round(elapsed, 3),
+        rps=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        latency_ms={
+            name: round(value * 1000, 3) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p90", percentile(latencies, 0.90)),
+                ("p99", percentile(latencies, 0.99)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+    )
+
+
+def run_workload(workload, page_path, meta, concurrency=16, duration=5.0, requests=0, tanner_latency=0.0, warmup=0.5):
+    tanner, tanner_port = start_process(start_tanner(workload.detections, tanner_latency))
+    try:
+        run_args = create_run_args(page_path, tanner_port, workload.dorks)
+        snare, port = start_process(start_snare(run_args, meta))
+        try:
+            loop = asyncio.new_event_loop()
+            try:
+                if warmup:
+                    loop.run_until_complete(generate_load(workload, port, concurrency, warmup, 0))
+                result = loop.run_until_complete(generate_load(workload, port, concurrency, duration, requests))
+            finally:
+                loop.close()
+            result["rss_kb"] = rss_kb(snare.pid)
+        finally:
+            stop_process(snare)
+    finally:
+        stop_process(tanner)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Returns the regressions of results against the baseline, beyond the relative tolerance"""
+    regressions = []
+    for name, result in results["workloads"].items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append("{}: {} req/s, baseline {} req/s".format(name, result["rps"], base["rps"]))
+        p99, base_p99 = result["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        if p99 is not None and base_p99 is not None and p99 > base_p99 * (1 + tolerance):
+            regressions.append("{}: p99 {} ms, baseline {} ms".format(name, p99, base_p99))
+        if result["errors"] > base["errors"]:
+            regressions.append("{}: {} errors, baseline {}".format(name, result["errors"], base["errors"]))
+    return regressions
+
+
+def run(args):
+    workloads = [workload for workload in WORKLOADS if not args.workload or workload.name in args.workload]
+    page_path = tempfile.mkdtemp(prefix="snare-bench-")
+    try:
+        meta = create_site(page_path, args.page_size * 1024)
+        results = dict(
+            config=dict(
+                concurrency=args.concurrency,
+                duration=args.duration,
+                requests=args.requests,
+                tanner_latency_ms=args.tanner_latency,
+                page_size_kb=args.page_size,
+                python=platform.python_version(),
+                machine=platform.machine(),
+                cpus=os.cpu_count(),
+            ),
+            workloads={},
+        )
+        for workload in workloads:
+            results["workloads"][workload.name] = run_workload(
+                workload,
+                page_path,
+                meta,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                requests=args.requests,
+                tanner_latency=args.tanner_latency / 1000,
+            )
+    finally:
+        shutil.rmtree(page_path)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="end-to-end load benchmark of snare against a stub tanner")
+    parser.add_argument(
+        "--workload",
+        help="workload to run, can be repeated, default: all",
+        action="append",
+        choices=[workload.name for workload in WORKLOADS],
+    )
+    parser.add_argument("--concurrency", help="requests in flight", type=int, default=16)
+    parser.add_argument("--duration", help="seconds per workload", type=float, default=5.0)
+    parser.add_argument(
+        "--requests", help="stop after this many requests per workload, 0 for no limit", type=int, default=0
+    )
+    parser.add_argument("--tanner-latency", help="latency of the stub tanner in ms", type=float, default=0)
+    parser.add_argument("--page-size", help="size of the HTML pages in KB", type=int, default=32)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument(
+        "--baseline",
+        help="compare the results against this baseline file, default: the stored one",
+        nargs="?",
+        const=BASELINE,
+    )
+    parser.add_argument(
+        "--save-baseline",
+        help="store the results as the baseline in this file, default: the stored one",
+        nargs="?",
+        const=BASELINE,
+    )
+    parser.add_argument("--tolerance", help="allowed relative regression against the baseline", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            fh.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
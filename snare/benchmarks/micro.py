@@ -0,0 +1,308 @@
+"""
+Micro-benchmarks of the functions every request or cloned page goes through.
+
+Each benchmark runs a fixed number of iterations per repeat against fixture pages of several sizes and reports
+the best and the median time per call. Runs are appended to a JSON lines history and compared with the previous
+run, so the effect of a change to one of the functions can be read off directly.
+
+    python3 -m snare.benchmarks.micro
+    python3 -m snare.benchmarks.micro --benchmark handle_content --size large --label "cache compiled pages"
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import aiohttp_jinja2
+import jinja2
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from snare.cloner import Cloner
+from snare.dork_pool import DorkPool
+from snare.html_handler import HtmlHandler
+from snare.middlewares import SnareMiddleware
+from snare.tanner_handler import TannerHandler
+
+HISTORY = os.path.join(os.path.dirname(__file__), "history.jsonl")
+
+# fixture page sizes in KB
+SIZES = dict(small=4, medium=64, large=512)
+
+# name, iterations per repeat, whether it runs per page size, setup(fixtures, size) returning the call to time
+Benchmark = namedtuple("Benchmark", ["name", "iterations", "sized", "setup"])
+
+
+class Transport:
+    """Just enough of a transport for create_data to read the peer"""
+
+    def get_extra_info(self, name, default=None):
+        if name == "peername":
+            return ("192.0.2.1", 43210)
+        return default
+
+
+def create_page(size):
+    """HTML of about size bytes with the links, forms, scripts and paragraphs of a cloned page"""
+    head = (
+        "<html><head><title>bench</title>"
+        "<link rel='stylesheet' href='/css/style.css'><script src='http://example.com/js/app.js'></script>"
+        "</head><body><form action='/login.php' method='post'>"
+        "<input type='hidden' name='redirect_to' value='http://example.com/admin/'></form>"
+    )
+    blocks = []
+    length = len(head)
+    idx = 0
+    while length < size:
+        block = (
+            "<div class='post'><h2><a href='/post/{0}.html'>Post {0}</a></h2>"
+            "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore "
+            "et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris.</p>"
+            "<img src='/img/{0}.png'><a href='http://example.com/tag/{0}?page=2'>tag</a>"
+            "<a href='https://other.example.org/{0}'>elsewhere</a></div>"
+        ).format(idx)
+        blocks.append(block)
+        length += len(block)
+        idx += 1
+    return (head + "".join(blocks) + "</body></html>").encode()
+
+
+class Fixtures:
+    """Cloned site of fixture pages and the handlers the benchmarks call into"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {name: create_page(kb * 1024) for name, kb in SIZES.items()}
+        meta = {
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/index.html": {"hash": "small_hash", "headers": [{"Content-Type": "text/html"}]},
+        }
+        with open(os.path.join(path, "404_hash"), "wb") as fh:
+            fh.write(b"<html><body>Not Found</body></html>")
+        for name, content in self.pages.items():
+            with open(os.path.join(path, name + "_hash"), "wb") as fh:
+                fh.write(content)
+            meta["/{}.html".format(name)] = {"hash": name + "_hash", "headers": [{"Content-Type": "text/html"}]}
+        self.run_args = argparse.Namespace(
+            full_page_path=path, tanner="127.0.0.1", no_dorks=True, index_page="/index.html"
+        )
+        self.tanner_handler = TannerHandler(self.run_args, meta, b"9c10172f-7ce2-4fb4-b1c6-abc70141db56")
+        self.dorks = ["/{:04x}/search.php?q={}".format(idx, idx) for idx in range(1000)]
+
+    def html_handler(self, no_dorks):
+        handler = HtmlHandler(no_dorks, "127.0.0.1")
+
+        async def fetch():
+            return list(self.dorks)
+
+        handler.dork_pool = DorkPool(fetch)
+        return handler
+
+    def cloner(self):
+        # max_depth 0 keeps the found links out of the crawl queue
+        return Cloner("http://example.com", 0, "false", default_path=self.path)
+
+
+def bench_create_data(fixtures, size):
+    request = make_mocked_request(
+        "GET",
+        "/index.html?id=1&sort=asc",
+        headers={
+            "Host": "example.com",
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:102.0) Gecko/20100101 Firefox/102.0",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+            "Cookie": "sess_uuid=9f2c0b2e8d1a4e7b; theme=dark",
+        },
+        transport=Transport(),
+    )
+    handler = fixtures.tanner_handler
+    return lambda: handler.create_data(request, 200)
+
+
+def bench_parse_type1(fixtures, size):
+    handler = fixtures.tanner_handler
+    name = "/{}.html".format(size)
+    return lambda: handler.parse_tanner_response(name, {"type": 1})
+
+
+def bench_parse_type2(fixtures, size):
+    handler = fixtures.tanner_handler
+    detection = {"type": 2, "payload": {"page": "/{}.html".format(size), "value": "<script>alert(1)</script>"}}
+    return lambda: handler.parse_tanner_response("/index.html?q=<script>", detection)
+
+
+def bench_parse_type3(fixtures, size):
+    handler = fixtures.tanner_handler
+    detection = {"type": 3, "payload": {"status_code": 500}}
+    return lambda: handler.parse_tanner_response("/index.html?file=../../etc/passwd", detection)
+
+
+def bench_handle_content(no_dorks):
+    def setup(fixtures, size):
+        handler = fixtures.html_handler(no_dorks)
+        content = fixtures.pages[size]
+        return lambda: handler.handle_content(content, key=size)
+
+    return setup
+
+
+def bench_middleware_404(fixtures, size):
+    app = web.Application()
+    aiohttp_jinja2.setup(app, loader=jinja2.DictLoader({"404_hash": "<html><body>Not Found</body></html>"}))
+    middleware = SnareMiddleware("404_hash", server_header="nginx")
+    error_middleware = middleware.create_error_middleware({404: middleware.handle_404})
+    request = make_mocked_request("GET", "/missing.html", app=app)
+
+    async def handler(request):
+        return web.Response(status=404)
+
+    return lambda: error_middleware(request, handler)
+
+
+def bench_replace_links(fixtures, size):
+    cloner = fixtures.cloner()
+    content = fixtures.pages[size].decode()
+    return lambda: cloner.replace_links(content, 0)
+
+
+BENCHMARKS = (
+    Benchmark("create_data", 20000, False, bench_create_data),
+    Benchmark("parse_tanner_response.type1", 2000, True, bench_parse_type1),
+    Benchmark("parse_tanner_response.type2", 2000, True, bench_parse_type2),
+    Benchmark("parse_tanner_response.type3", 20000, False, bench_parse_type3),
+    Benchmark("handle_content.no_dorks", 2000, True, bench_handle_content(True)),
+    Benchmark("handle_content.dorks", 200, True, bench_handle_content(False)),
+    Benchmark("middleware.error_404", 5000, False, bench_middleware_404),
+    Benchmark("replace_links", 5, True, bench_replace_links),
+)
+
+
+async def time_calls(call, iterations):
+    """Seconds per call over iterations calls, coroutines are awaited"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = call()
+        if asyncio.iscoroutine(result):
+            await result
+    return (time.perf_counter() - start) / iterations
+
+
+def run_benchmark(loop, benchmark, fixtures, size, repeat, scale):
+    call = loop.run_until_complete(setup_call(benchmark, fixtures, size))
+    iterations = max(1, int(benchmark.iterations * scale))
+    # the first call compiles and caches, which the repeats shouldn't see
+    loop.run_until_complete(time_calls(call, 1))
+    timings = [loop.run_until_complete(time_calls(call, iterations)) for _ in range(repeat)]
+    return dict(
+        iterations=iterations,
+        repeat=repeat,
+        best_us=round(min(timings) * 1e6, 3),
+        median_us=round(statistics.median(timings) * 1e6, 3),
+    )
+
+
+async def setup_call(benchmark, fixtures, size):
+    # handlers create their futures and tasks on the benchmark loop
+    return benchmark.setup(fixtures, size)
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def compare(results, previous):
+    """Relative change of the best time per call against the previous run, negative is faster"""
+    changes = {}
+    for name, result in results.items():
+        before = previous.get(name)
+        if before and before["best_us"]:
+            changes[name] = round(result["best_us"] / before["best_us"] - 1, 3)
+    return changes
+
+
+def run(args):
+    # a prefix selects a whole group, e.g. parse_tanner_response
+    benchmarks = [
+        benchmark
+        for benchmark in BENCHMARKS
+        if not args.benchmark
+        or any(benchmark.name == name or benchmark.name.startswith(name + ".") for name in args.benchmark)
+    ]
+    sizes = args.size or list(SIZES)
+    results = {}
+    path = tempfile.mkdtemp(prefix="snare-micro-")
+    loop = asyncio.new_event_loop()
+    try:
+        fixtures = Fixtures(path)
+        for benchmark in benchmarks:
+            for size in sizes if benchmark.sized else [None]:
+                name = "{}[{}]".format(benchmark.name, size) if size else benchmark.name
+                results[name] = run_benchmark(loop, benchmark, fixtures, size or "small", args.repeat, args.scale)
+                print(
+                    "{:<45} {:>12.3f} us  (median {:.3f} us, {} x {})".format(
+                        name,
+                        results[name]["best_us"],
+                        results[name]["median_us"],
+                        args.repeat,
+                        results[name]["iterations"],
+                    ),
+                    file=sys.stderr,
+                )
+    finally:
+        loop.close()
+        shutil.rmtree(path)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="micro-benchmarks of the per-request hot functions of snare")
+    parser.add_argument(
+        "--benchmark",
+        help="benchmark or group of benchmarks to run, can be repeated, default: all",
+        action="append",
+    )
+    parser.add_argument(
+        "--size", help="fixture page size, can be repeated, default: all", action="append", choices=SIZES
+    )
+    parser.add_argument(
+        "--repeat", help="repeats of the fixed iterations, the best one is reported", type=int, default=5
+    )
+    parser.add_argument("--scale", help="multiplier of the iteration counts", type=float, default=1.0)
+    parser.add_argument("--label", help="note stored with the run in the history, e.g. the change measured")
+    parser.add_argument("--history", help="JSON lines file the runs are appended to", default=HISTORY)
+    parser.add_argument("--no-history", help="don't append the run to the history", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    history = read_history(args.history)
+    entry = dict(
+        time=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        label=args.label,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        results=results,
+    )
+    if history:
+        entry["changes"] = compare(results, history[-1]["results"])
+    print(json.dumps(entry, indent=2, sort_keys=True))
+    if not args.no_history:
+        with open(args.history, "a") as fh:
+            fh.write(json.dumps(entry, sort_keys=True) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,16 +10,110 @@ import cssutils
 import yarl
 from bs4 import BeautifulSoup
 from asyncio import Queue
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 animation = "|/-\\"
 
+# bodies which aren't rewritten are written to disk in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+# append-only record of the crawl in the target directory, a clone continues from it with --resume
+JOURNAL_NAME = "crawl.journal"
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def resolve_link(url, root, moved_root, check_host=False):
+    """
+    Returns the absolute URL a link points to, None when it isn't crawled, and its relative replacement,
+    None when the link is left as it is
+    """
+    try:
+        url = yarl.URL(url)
+    except UnicodeError:
+        return None, None
+    if url.scheme in ["data", "javascript", "file"]:
+        return None, url.human_repr()
+    if not url.is_absolute():
+        if moved_root is None:
+            url = root.join(url)
+        else:
+            url = moved_root.join(url)
+
+    host = url.host
+
+    if check_host:
+        if (
+            (host != root.host and moved_root is None)
+            or url.fragment
+            or (moved_root is not None and host != moved_root.host)
+        ):
+            return None, None
+
+    res = None
+    try:
+        res = url.relative().human_repr()
+    except ValueError:
+        logging.getLogger(__name__).error("ValueError while processing the %s link", url)
+    return url, res
+
+
+def prevent_redirects(soup):
+    for redir in soup.findAll(True, attrs={"name": re.compile("redirect.*")}):
+        if redir["value"] != "":
+            redir["value"] = yarl.URL(redir["value"]).relative().human_repr()
+
+
+def rewrite_html(data, root, moved_root):
+    """Same rewriting as Cloner.replace_links, run in the parse pool: returns the page and the URLs found in it"""
+    soup = BeautifulSoup(data, "html.parser")
+    found = []
+    # relative links, images and scripts, action elements
+    for attr, check_host in (("href", True), ("src", False), ("action", False)):
+        for elem in soup.findAll(**{attr: True}):
+            url, res = resolve_link(elem[attr], root, moved_root, check_host)
+            if url is not None:
+                found.append(url)
+            if res is not None:
+                elem[attr] = res
+    prevent_redirects(soup)
+    return str(soup).encode(), found
+
+
+def find_css_urls(data, root, css_validate):
+    css = cssutils.parseString(data, validate=css_validate)
+    urls = []
+    for carved_url in cssutils.getUrls(css):
+        if carved_url.startswith("data"):
+            continue
+        carved_url = yarl.URL(carved_url)
+        if not carved_url.is_absolute():
+            carved_url = root.join(carved_url)
+        urls.append(carved_url)
+    return urls
+
 
 class Cloner(object):
-    def __init__(self, root, max_depth, css_validate, default_path="/opt/snare"):
+    def __init__(
+        self,
+        root,
+        max_depth,
+        css_validate,
+        default_path="/opt/snare",
+        workers=8,
+        max_per_host=4,
+        parse_workers=0,
+        max_body_size=0,
+        checksum=False,
+    ):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.visited_urls = []
+        # canonical keys of the fetched and of the queued URLs, see canonical_url
+        self.visited_urls = set()
+        self.queued_urls = set()
         self.root, self.error_page = self.add_scheme(root)
         self.max_depth = max_depth
         self.moved_root = None
@@ -34,6 +128,19 @@ class Cloner(object):
         self.new_urls = Queue()
         self.meta = defaultdict(dict)
 
+        self.workers = workers
+        # caps the requests in flight to each host, pages and their assets may come from several
+        self.host_limits = defaultdict(lambda: asyncio.Semaphore(max_per_host))
+        # processes parsing HTML and CSS off the event loop, 0 parses on the loop
+        self.parse_workers = parse_workers
+        self.parse_pool = None
+        self.parse_futures = set()
+        # bodies above this many bytes are skipped, 0 for no limit
+        self.max_body_size = max_body_size
+        # stores the sha256 of every body in meta.json
+        self.checksum = checksum
+        self.journal = None
+
         self.counter = 0
         self.itr = 0
 
@@ -45,6 +152,70 @@ class Cloner(object):
         err_url = new_url.with_path("/status_404").with_query(None).with_fragment(None)
         return new_url, err_url
 
+    @staticmethod
+    def canonical_url(url):
+        """Variants of a URL fetching the same page share the key: no fragment, default port and trailing slash.
+        The query is kept as it is, snare serves the pages by their query as written"""
+        if url.explicit_port is not None and url.is_default_port():
+            url = url.with_port(None)
+        query = url.raw_query_string
+        url = url.with_path(url.raw_path.rstrip("/") or "/", encoded=True)
+        return str(url) + ("?" + query if query else "")
+
+    async def enqueue(self, url, level):
+        key = self.canonical_url(url)
+        if key in self.queued_urls or key in self.visited_urls:
+            return
+        self.queued_urls.add(key)
+        await self.new_urls.put((url, level))
+        self.write_journal({"queued": str(url), "level": level})
+
+    def open_journal(self, resume=False):
+        path = os.path.join(self.target_path, JOURNAL_NAME)
+        if resume:
+            if os.path.exists(path):
+                self.load_journal(path)
+            else:
+                self.logger.warning("No %s to resume from, cloning from the root", path)
+        # line buffered, a killed clone loses at most the record it was writing
+        self.journal = open(path, "a" if resume else "w", encoding="utf-8", buffering=1)
+
+    def load_journal(self, path):
+        """Restores the meta entries and the visited URLs of the journal and queues the URLs not cloned yet"""
+        pending = {}
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # cut off by the interruption
+                    continue
+                if "queued" in record:
+                    url = yarl.URL(record["queued"], encoded=True)
+                    pending.setdefault(self.canonical_url(url), (url, record["level"]))
+                else:
+                    self.visited_urls.add(record["done"])
+                    pending.pop(record["done"], None)
+                    if record["meta"] is not None:
+                        self.meta[record["file_name"]] = record["meta"]
+                        self.counter = self.counter + 1
+        for key, item in pending.items():
+            self.queued_urls.add(key)
+            self.new_urls.put_nowait(item)
+        self.logger.info("Resuming with %s cloned and %s queued URLs", len(self.visited_urls), len(pending))
+
+    def write_journal(self, record):
+        if self.journal is not None:
+            self.journal.write(json.dumps(record) + "\n")
+
+    def close_journal(self, completed):
+        if self.journal is None:
+            return
+        self.journal.close()
+        self.journal = None
+        if completed:
+            os.remove(os.path.join(self.target_path, JOURNAL_NAME))
+
     @staticmethod
     def get_headers(response):
         ignored_headers_lowercase = [
@@ -66,35 +237,9 @@ class Cloner(object):
         return headers
 
     async def process_link(self, url, level, check_host=False):
-        try:
-            url = yarl.URL(url)
-        except UnicodeError:
-            return None
-        if url.scheme in ["data", "javascript", "file"]:
-            return url.human_repr()
-        if not url.is_absolute():
-            if self.moved_root is None:
-                url = self.root.join(url)
-            else:
-                url = self.moved_root.join(url)
-
-        host = url.host
-
-        if check_host:
-            if (
-                (host != self.root.host and self.moved_root is None)
-                or url.fragment
-                or (self.moved_root is not None and host != self.moved_root.host)
-            ):
-                return None
-        if url.human_repr() not in self.visited_urls and (level + 1) <= self.max_depth:
-            await self.new_urls.put((url, level + 1))
-
-        res = None
-        try:
-            res = url.relative().human_repr()
-        except ValueError:
-            self.logger.error("ValueError while processing the %s link", url)
+        url, res = resolve_link(url, self.root, self.moved_root, check_host)
+        if url is not None and (level + 1) <= self.max_depth:
+            await self.enqueue(url, level + 1)
         return res
 
     async def replace_links(self, data, level):
@@ -119,9 +264,7 @@ class Cloner(object):
                 act_link["action"] = res
 
         # prevent redirects
-        for redir in soup.findAll(True, attrs={"name": re.compile("redirect.*")}):
-            if redir["value"] != "":
-                redir["value"] = yarl.URL(redir["value"]).relative().human_repr()
+        prevent_redirects(soup)
 
         return soup
 
@@ -133,6 +276,9 @@ class Cloner(object):
             file_name = url.human_repr()
         if not file_name.startswith("/"):
             file_name = "/" + file_name
+        # /dir/ and /dir share a canonical URL and are cloned once, snare serves both from the slash-less name
+        path, query_sep, query = file_name.partition("?")
+        file_name = (path.rstrip("/") or "/") + query_sep + query
 
         if file_name == "/" or file_name == "":
             if host == self.root.host or self.moved_root is not None and self.moved_root.host == host:
@@ -144,49 +290,162 @@ class Cloner(object):
         hash_name = m.hexdigest()
         return file_name, hash_name
 
-    async def get_body(self, session):
-        while not self.new_urls.empty():
-            print(animation[self.itr % len(animation)], end="\r")
-            self.itr = self.itr + 1
-            current_url, level = await self.new_urls.get()
-            if current_url.human_repr() in self.visited_urls:
-                continue
-            self.visited_urls.append(current_url.human_repr())
-            file_name, hash_name = self._make_filename(current_url)
-            self.logger.debug("Cloned file: %s", file_name)
-            data = None
-            content_type = None
+    def check_body_size(self, size):
+        if self.max_body_size and size is not None and size > self.max_body_size:
+            raise BodyTooLarge("body larger than {} bytes".format(self.max_body_size))
+
+    async def read_body(self, response):
+        if not self.max_body_size:
+            return await response.read()
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            size += len(chunk)
+            self.check_body_size(size)
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def store_body(self, response, hash_name):
+        """Streams the body to its file, returns its sha256 when checksums are enabled"""
+        file_path = os.path.join(self.target_path, hash_name)
+        # a body which fails half way doesn't replace the last complete one
+        part_path = file_path + ".part"
+        checksum = hashlib.sha256() if self.checksum else None
+        size = 0
+        try:
+            with open(part_path, "wb") as body_fh:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    self.check_body_size(size)
+                    if checksum is not None:
+                        checksum.update(chunk)
+                    body_fh.write(chunk)
+        except BaseException:
+            os.remove(part_path)
+            raise
+        os.replace(part_path, file_path)
+        return checksum.hexdigest() if checksum is not None else None
+
+    async def get_page(self, session, current_url, level):
+        print(animation[self.itr % len(animation)], end="\r")
+        self.itr = self.itr + 1
+        file_name, hash_name = self._make_filename(current_url)
+        self.logger.debug("Cloned file: %s", file_name)
+        data = None
+        content_type = None
+        stored = False
+        skipped = False
+        digest = None
+        async with self.host_limits[current_url.host]:
             try:
                 response = await session.get(current_url, headers={"Accept": "text/html"}, timeout=10.0)
                 headers = self.get_headers(response)
                 content_type = response.content_type
-                data = await response.read()
+                self.check_body_size(response.content_length)
+                if content_type in ("text/html", "text/css"):
+                    # the links are rewritten, so these are kept in memory
+                    data = await self.read_body(response)
+                else:
+                    digest = await self.store_body(response, hash_name)
+                    stored = True
             except (aiohttp.ClientError, asyncio.TimeoutError) as client_error:
                 self.logger.error(client_error)
+            except BodyTooLarge as err:
+                # closed instead of released, the rest of the body isn't read
+                response.close()
+                self.logger.warning("Skipped %s: %s", current_url, err)
+                skipped = True
             else:
                 await response.release()
 
-            if data is not None:
-                self.meta[file_name]["hash"] = hash_name
-                self.meta[file_name]["headers"] = headers
-                self.counter = self.counter + 1
-
-                if content_type == "text/html":
-                    soup = await self.replace_links(data, level)
-                    data = str(soup).encode()
-                elif content_type == "text/css":
-                    css = cssutils.parseString(data, validate=self.css_validate)
-                    for carved_url in cssutils.getUrls(css):
-                        if carved_url.startswith("data"):
-                            continue
-                        carved_url = yarl.URL(carved_url)
-                        if not carved_url.is_absolute():
-                            carved_url = self.root.join(carved_url)
-                        if carved_url.human_repr() not in self.visited_urls:
-                            await self.new_urls.put((carved_url, level + 1))
-
-                with open(os.path.join(self.target_path, hash_name), "wb") as index_fh:
-                    index_fh.write(data)
+        if data is None and not stored:
+            if skipped:
+                self.write_journal({"done": self.canonical_url(current_url), "file_name": file_name, "meta": None})
+            return
+        self.meta[file_name]["hash"] = hash_name
+        self.meta[file_name]["headers"] = headers
+        self.counter = self.counter + 1
+
+        if content_type == "text/html":
+            if self.parse_pool is None:
+                soup = await self.replace_links(data, level)
+                data = str(soup).encode()
+            else:
+                data, found = await self.parse(rewrite_html, data, self.root, self.moved_root)
+                if (level + 1) <= self.max_depth:
+                    for url in found:
+                        await self.enqueue(url, level + 1)
+        elif content_type == "text/css":
+            if self.parse_pool is None:
+                carved_urls = find_css_urls(data, self.root, self.css_validate)
+            else:
+                carved_urls = await self.parse(find_css_urls, data, self.root, self.css_validate)
+            for carved_url in carved_urls:
+                await self.enqueue(carved_url, level + 1)
+
+        if data is not None:
+            if self.checksum:
+                digest = hashlib.sha256(data).hexdigest()
+            with open(os.path.join(self.target_path, hash_name), "wb") as index_fh:
+                index_fh.write(data)
+        if digest is not None:
+            self.meta[file_name]["sha256"] = digest
+        # written once the file is, a resumed clone fetches the pages without a record again
+        self.write_journal(
+            {"done": self.canonical_url(current_url), "file_name": file_name, "meta": self.meta[file_name]}
+        )
+
+    async def parse(self, func, *args):
+        future = self.parse_pool.submit(func, *args)
+        self.parse_futures.add(future)
+        future.add_done_callback(self.parse_futures.discard)
+        return await asyncio.wrap_future(future)
+
+    def stop_parse_pool(self):
+        # shutdown(cancel_futures=True) is Python 3.9+, the pages still waiting for a process are dropped here
+        for future in list(self.parse_futures):
+            future.cancel()
+        self.parse_pool.shutdown(wait=True)
+        self.parse_pool = None
+
+    async def crawl(self, session, urls):
+        while urls:
+            current_url, level = urls.popleft()
+            key = self.canonical_url(current_url)
+            if key in self.visited_urls:
+                continue
+            self.visited_urls.add(key)
+            self.queued_urls.discard(key)
+            await self.get_page(session, current_url, level)
+
+    async def get_body(self, session):
+        if self.parse_workers > 0:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        try:
+            await self.crawl_depths(session)
+        finally:
+            if self.parse_pool is not None:
+                self.stop_parse_pool()
+
+    async def crawl_depths(self, session):
+        while not self.new_urls.empty():
+            # One depth at a time, like a sequential crawl: every page is reached at its lowest depth, so
+            # max_depth cuts the same pages. The workers share the URLs of this depth and queue the next one.
+            pending = []
+            while not self.new_urls.empty():
+                pending.append(self.new_urls.get_nowait())
+            # a resumed frontier may still hold the next depth as well
+            depth = min(level for _, level in pending)
+            urls = deque(item for item in pending if item[1] == depth)
+            for item in pending:
+                if item[1] != depth:
+                    self.new_urls.put_nowait(item)
+            workers = [asyncio.ensure_future(self.crawl(session, urls)) for _ in range(min(self.workers, len(urls)))]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
 
     async def get_root_host(self):
         try:
@@ -199,15 +458,19 @@ class Cloner(object):
             self.logger.error("Can't connect to target host: %s", err)
             exit(-1)
 
-    async def run(self):
+    async def run(self, resume=False):
         session = aiohttp.ClientSession()
+        completed = False
         try:
-            await self.new_urls.put((self.root, 0))
-            await self.new_urls.put((self.error_page, 0))
+            self.open_journal(resume)
+            await self.enqueue(self.root, 0)
+            await self.enqueue(self.error_page, 0)
             await self.get_body(session)
+            completed = True
         except KeyboardInterrupt:
             raise
         finally:
             with open(os.path.join(self.target_path, "meta.json"), "w") as mj:
                 json.dump(self.meta, mj)
+            self.close_journal(completed)
             await session.close()
@@ -0,0 +1,61 @@
+import gzip
+import io
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/x-javascript",
+    "application/xhtml+xml",
+    "application/xml",
+    "image/svg+xml",
+    "image/x-icon",
+)
+
+
+def available_encodings():
+    """Encodings snare can produce, in order of preference"""
+    if brotli is not None:
+        return ["br", "gzip"]
+    return ["gzip"]
+
+
+def is_compressible(content_type):
+    if not content_type:
+        return False
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def choose_encoding(accept_encoding, encodings):
+    """Picks the first of encodings which the Accept-Encoding header allows"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip()] = quality
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(bytes(content), quality=9)
+    buffer = io.BytesIO()
+    # mtime=0 so the same page always compresses to the same bytes
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as fh:
+        fh.write(content)
+    return buffer.getvalue()
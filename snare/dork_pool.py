@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+class DorkPool:
+    """
+    Dorks waiting to be served, refilled in the background once the pool drops to the low watermark.
+    Served dorks are remembered and recycled while a refill is still on its way.
+    After a failed or empty fetch no refill is started for retry_delay seconds.
+    """
+
+    def __init__(self, fetch, low_watermark=20, max_recycled=1000, retry_delay=10):
+        self.fetch = fetch
+        self.low_watermark = low_watermark
+        self.dorks = []
+        self.served = deque(maxlen=max_recycled)
+        self.refill_task = None
+        self.retry_delay = retry_delay
+        self.retry_at = 0
+        self.counters = dict(served=0, recycled=0, fetches=0, fetch_errors=0)
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def depth(self):
+        return len(self.dorks)
+
+    def refill(self):
+        # Concurrent callers share the refill which is already running
+        if self.refill_task is None or self.refill_task.done():
+            if time.monotonic() < self.retry_at:
+                return None
+            self.refill_task = asyncio.ensure_future(self.fetch_dorks())
+        return self.refill_task
+
+    async def fetch_dorks(self):
+        self.counters["fetches"] += 1
+        try:
+            dorks = await self.fetch()
+        except Exception as e:
+            self.counters["fetch_errors"] += 1
+            self.logger.error("Error refilling the dork pool: %s", e)
+            self.retry_at = time.monotonic() + self.retry_delay
+            return
+        if not dorks:
+            self.logger.warning("Tanner returned no dorks, retrying in %s seconds", self.retry_delay)
+            self.retry_at = time.monotonic() + self.retry_delay
+            return
+        # the dorks left in the pool are served first
+        self.dorks[:0] = dorks
+
+    async def pop(self):
+        if len(self.dorks) <= self.low_watermark:
+            self.refill()
+        if not self.dorks and not self.served:
+            refill = self.refill()
+            if refill is not None:
+                await refill
+        if not self.dorks:
+            # concurrent waiters of the first fetch may have drained it already
+            if not self.served:
+                raise IndexError("no dorks available")
+            self.counters["recycled"] += 1
+            self.served.rotate(-1)
+            return self.served[-1]
+        dork = self.dorks.pop()
+        self.served.append(dork)
+        self.counters["served"] += 1
+        return dork
+
+    async def stop(self):
+        if self.refill_task is not None and not self.refill_task.done():
+            self.refill_task.cancel()
+            await asyncio.gather(self.refill_task, return_exceptions=True)
@@ -0,0 +1,48 @@
+import asyncio
+
+
+class EventBatcher:
+    def __init__(self, submit_batch, max_size=50, max_linger=0.05):
+        self.submit_batch = submit_batch
+        self.max_size = max_size
+        self.max_linger = max_linger
+        self.pending = []
+        self.timer = None
+        self.flushes = set()
+
+    async def submit(self, data):
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append((data, future))
+        if len(self.pending) >= self.max_size:
+            self.schedule_flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_event_loop().call_later(self.max_linger, self.schedule_flush)
+        return await future
+
+    def schedule_flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        flush = asyncio.ensure_future(self.flush(batch))
+        self.flushes.add(flush)
+        flush.add_done_callback(self.flushes.discard)
+
+    async def flush(self, batch):
+        try:
+            event_results = await self.submit_batch([data for data, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), event_result in zip(batch, event_results):
+                if not future.done():
+                    future.set_result(event_result)
+
+    async def stop(self):
+        self.schedule_flush()
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
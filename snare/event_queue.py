@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+
+class EventQueue:
+    OVERFLOW_POLICIES = ("drop-oldest", "block")
+
+    def __init__(self, submit, maxsize=1000, workers=4, overflow="drop-oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        self.submit = submit
+        self.maxsize = maxsize
+        self.workers = workers
+        self.overflow = overflow
+        self.queue = None
+        self.tasks = []
+        self.counters = dict(queued=0, sent=0, dropped=0, failed=0)
+        self.logger = logging.getLogger(__name__)
+
+    async def start(self):
+        # The queue is created here so it binds to the serving loop
+        self.queue = asyncio.Queue(self.maxsize)
+        self.tasks = [asyncio.ensure_future(self.worker()) for _ in range(self.workers)]
+
+    async def put(self, data):
+        if self.queue.full() and self.overflow == "drop-oldest":
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.counters["dropped"] += 1
+        await self.queue.put(data)
+        self.counters["queued"] += 1
+
+    async def worker(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.submit(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["failed"] += 1
+                self.logger.error("Error delivering queued event: %s", e)
+            else:
+                self.counters["sent"] += 1
+            finally:
+                self.queue.task_done()
+
+    async def stop(self, timeout=5.0):
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.error("Dropping %s undelivered events", self.queue.qsize())
+                self.counters["dropped"] += self.queue.qsize()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.logger.info("Event queue stopped: %s", self.counters)
@@ -1,35 +1,55 @@
 import asyncio
 import json
 import logging
+import time
+import uuid
 import cssutils
 import aiohttp
 from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+from snare.dork_pool import DorkPool
+from snare.metrics import Histogram
 
 
 class HtmlHandler:
-    def __init__(self, no_dorks, tanner):
+    def __init__(self, no_dorks, tanner, dorks_low_watermark=20, tanner_port=8090):
         self.no_dorks = no_dorks
-        self.dorks = []
+        self.dork_pool = DorkPool(lambda: self.get_dorks(), low_watermark=dorks_low_watermark)
         self.logger = logging.getLogger(__name__)
         self.tanner = tanner
+        self.tanner_port = tanner_port
+        # Pooled session shared by TannerHandler, a one-off session is used when unset
+        self.session = None
+        # Compiled pages, see compile_template and compile_payload_template
+        self.templates = {}
+        self.render_seconds = Histogram()
+        self.payload_templates = {}
 
     async def get_dorks(self):
         dorks = None
+        session = self.session if self.session is not None else aiohttp.ClientSession()
         try:
-            async with aiohttp.ClientSession() as session:
-                r = await session.get("http://{0}:8090/dorks".format(self.tanner), timeout=10.0)
-                try:
-                    dorks = await r.json()
-                except json.decoder.JSONDecodeError as e:
-                    self.logger.error("Error getting dorks: %s", e)
-                finally:
-                    await r.release()
+            r = await session.get("http://{0}:{1}/dorks".format(self.tanner, self.tanner_port), timeout=10.0)
+            try:
+                dorks = await r.json()
+            except json.decoder.JSONDecodeError as e:
+                self.logger.error("Error getting dorks: %s", e)
+            finally:
+                await r.release()
         except asyncio.TimeoutError as error:
             self.logger.error("Dorks timeout error: %s", error)
+        finally:
+            if session is not self.session:
+                await session.close()
         return dorks["response"]["dorks"] if dorks else []
 
-    async def handle_content(self, content):
+    def compile_template(self, content):
+        """
+        Renders the page once with a placeholder for every dork link and splits it on the placeholders.
+        Joining the segments with the quoted dorks gives the same page as rendering it with the dorks.
+        """
         soup = BeautifulSoup(content, "html.parser")
+        slot = "snare-dork-{}".format(uuid.uuid4().hex)
         if self.no_dorks is not True:
             for p_elem in soup.find_all("p"):
                 if p_elem.findChildren():
@@ -40,14 +60,11 @@ class HtmlHandler:
                 text_list = p_elem.text.split()
                 p_new = soup.new_tag("p", style=css.cssText if css else None)
                 for idx, word in enumerate(text_list):
-                    # Fetch dorks if required
-                    if len(self.dorks) <= 0:
-                        self.dorks = await self.get_dorks()
                     word += " "
                     if idx % 5 == 0:
                         a_tag = soup.new_tag(
                             "a",
-                            href=self.dorks.pop(),
+                            href=slot,
                             style="color:{color};text-decoration:none;cursor:text;".format(
                                 color=css.color if css and "color" in css.keys() else "#000000"
                             ),
@@ -57,5 +74,58 @@ class HtmlHandler:
                     else:
                         p_new.append(soup.new_string(word))
                 p_elem.replace_with(p_new)
-        content = soup.encode("utf-8")
+        return soup.encode("utf-8").split('"{}"'.format(slot).encode("utf-8"))
+
+    @staticmethod
+    def quote_href(dork):
+        # same escaping and quoting BeautifulSoup applies to attribute values
+        value = EntitySubstitution.substitute_xml(str(dork))
+        return EntitySubstitution.quoted_attribute_value(value).encode("utf-8")
+
+    async def handle_content(self, content, key=None):
+        template_key = (self.no_dorks, content if key is None else key)
+        segments = self.templates.get(template_key)
+        if segments is None:
+            segments = self.compile_template(content)
+            self.templates[template_key] = segments
+        if len(segments) == 1:
+            return segments[0]
+        start = time.perf_counter()
+        parts = [segments[0]]
+        # With an empty pool the first request waits for tanner. When tanner has no dorks either, pop raises
+        # IndexError, right away for the requests which follow until the pool's retry delay is over.
+        for segment in segments[1:]:
+            parts.append(self.quote_href(await self.dork_pool.pop()))
+            parts.append(segment)
+        content = b"".join(parts)
+        self.render_seconds.observe(time.perf_counter() - start)
         return content
+
+    @staticmethod
+    def compile_payload_template(content):
+        """
+        Renders the page once and finds the offset where type-2 payloads go, at the end of <body>.
+        Returns None for pages without a body.
+        """
+        # same newline translation as reading the page in text mode
+        content = bytes(content).decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        soup = BeautifulSoup(content, "html.parser")
+        if soup.body is None:
+            return None
+        slot = "snare-payload-{}".format(uuid.uuid4().hex)
+        soup.body.append(slot)
+        page = str(soup).encode()
+        offset = page.index(slot.encode())
+        return page[:offset] + page[offset + len(slot) :], offset
+
+    def inject_payload(self, content, payload, key=None):
+        template_key = content if key is None else key
+        try:
+            template = self.payload_templates[template_key]
+        except KeyError:
+            template = self.payload_templates[template_key] = self.compile_payload_template(content)
+        if template is None:
+            raise AttributeError("page has no body to inject the payload into")
+        page, offset = template
+        payload = "<div>{}</div>".format(BeautifulSoup(payload, "html.parser")).encode()
+        return b"".join((page[:offset], payload, page[offset:]))
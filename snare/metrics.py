@@ -0,0 +1,117 @@
+import bisect
+import time
+from collections import defaultdict
+
+# Upper bounds in seconds, from a dict hit up to a slow TANNER round-trip
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+STAGES = ("create_data", "post_read", "submit_data", "slurp", "parse_tanner_response", "dork_rendering", "total")
+
+
+class Histogram:
+    """Latency histogram which only counts observations, the buckets are made cumulative when rendered"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTimer:
+    """Times the consecutive stages of one request"""
+
+    __slots__ = ("stages", "start", "last")
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage].observe(now - self.last)
+        self.last = now
+
+    def stop(self):
+        self.stages["total"].observe(time.perf_counter() - self.start)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Request metrics of snare, rendered in the Prometheus text format together with the component counters"""
+
+    def __init__(self):
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.detections = defaultdict(int)
+        self.collectors = []
+
+    def timer(self):
+        return RequestTimer(self.stages)
+
+    def add_collector(self, collect):
+        """collect returns (name, type, help, [(labels, value)]) tuples when the metrics are rendered"""
+        self.collectors.append(collect)
+
+    def collect(self):
+        yield (
+            "snare_detections_total",
+            "counter",
+            "Requests by the detection type TANNER returned",
+            [({"type": detection_type}, count) for detection_type, count in sorted(self.detections.items())],
+        )
+        for collect in self.collectors:
+            yield from collect()
+
+    def render(self):
+        lines = [
+            "# HELP snare_stage_duration_seconds Time spent in each stage of handling a request",
+            "# TYPE snare_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                lines.append(
+                    'snare_stage_duration_seconds_bucket{{stage="{}",le="{}"}} {}'.format(
+                        stage, format_value(bound), cumulative
+                    )
+                )
+            lines.append('snare_stage_duration_seconds_sum{{stage="{}"}} {}'.format(stage, format_value(histogram.sum)))
+            lines.append('snare_stage_duration_seconds_count{{stage="{}"}} {}'.format(stage, histogram.count))
+        for name, metric_type, description, samples in self.collect():
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for labels, value in samples:
+                if labels:
+                    label_text = ",".join('{}="{}"'.format(key, label) for key, label in labels.items())
+                    lines.append("{}{{{}}} {}".format(name, label_text, format_value(value)))
+                else:
+                    lines.append("{} {}".format(name, format_value(value)))
+        return "\n".join(lines) + "\n"
@@ -8,16 +8,22 @@ class SnareMiddleware:
         self.error_404 = error_404
         self.error_500 = error_500 if error_500 else "500.html"
 
-        self.headers = multidict.CIMultiDict()
+        self.server_header = server_header
+        self.headers = self.create_headers(headers)
+
+    def create_headers(self, headers):
+        error_headers = multidict.CIMultiDict()
         for header in headers:
             for key, value in header.items():
-                self.headers.add(key, value)
+                error_headers.add(key, value)
 
-        if server_header:
-            self.headers["Server"] = server_header
+        if self.server_header:
+            error_headers["Server"] = self.server_header
+        return error_headers
 
     async def handle_404(self, request):
-        return aiohttp_jinja2.render_template(self.error_404, request, {})
+        # virtual hosts have their own 404 page
+        return aiohttp_jinja2.render_template(request.get("error_404", self.error_404), request, {})
 
     async def handle_500(self, request):
         return aiohttp_jinja2.render_template(self.error_500, request, {})
@@ -31,7 +37,10 @@ class SnareMiddleware:
                 override = overrides.get(status)
                 if override:
                     response = await override(request)
-                    response.headers.update(self.headers)
+                    if status == 404 and "error_404_headers" in request:
+                        response.headers.update(self.create_headers(request["error_404_headers"]))
+                    else:
+                        response.headers.update(self.headers)
                     response.set_status(status)
                     return response
                 return response
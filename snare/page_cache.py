@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+
+class CacheBudget:
+    """Byte budget shared by several page caches, the least recently used entry of any of them is evicted first"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def use(self, cache, file_name):
+        self.entries.move_to_end((cache, file_name))
+
+    def add(self, cache, file_name, size):
+        self.entries[(cache, file_name)] = size
+        self.size += size
+        while self.size > self.max_bytes:
+            (evicted_cache, evicted_name), evicted_size = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            evicted_cache.evict(evicted_name)
+
+    def remove(self, cache, file_name):
+        self.size -= self.entries.pop((cache, file_name))
+
+
+class PageCache:
+    """LRU cache of page bodies keyed by file hash and bounded by their total size, or by a shared budget"""
+
+    def __init__(self, directory, max_bytes=0, budget=None):
+        self.dir = directory
+        self.budget = budget if budget is not None else CacheBudget(max_bytes)
+        self.size = 0
+        self.entries = OrderedDict()
+        self.counters = dict(hits=0, misses=0, evictions=0)
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def max_bytes(self):
+        return self.budget.max_bytes
+
+    def get(self, file_name):
+        try:
+            content = self.entries[file_name]
+        except KeyError:
+            return None
+        self.entries.move_to_end(file_name)
+        self.budget.use(self, file_name)
+        return content
+
+    def put(self, file_name, content):
+        if len(content) > self.max_bytes:
+            return
+        if file_name in self.entries:
+            self.remove(file_name)
+        self.entries[file_name] = content
+        self.size += len(content)
+        self.budget.add(self, file_name, len(content))
+
+    def remove(self, file_name):
+        content = self.entries.pop(file_name)
+        self.size -= len(content)
+        self.budget.remove(self, file_name)
+
+    def evict(self, file_name):
+        # called by the budget, which already dropped the entry
+        content = self.entries.pop(file_name)
+        self.size -= len(content)
+        self.counters["evictions"] += 1
+
+    def move_to(self, budget):
+        """Accounts the cached entries to another budget, which evicts them when it runs out"""
+        previous, self.budget = self.budget, budget
+        for file_name, content in list(self.entries.items()):
+            previous.remove(self, file_name)
+            budget.add(self, file_name, len(content))
+
+    def load(self, file_name):
+        path = os.path.join(self.dir, file_name)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    async def read(self, file_name):
+        content = self.get(file_name)
+        if content is not None:
+            self.counters["hits"] += 1
+            return content
+        self.counters["misses"] += 1
+        content = await asyncio.get_event_loop().run_in_executor(None, self.load, file_name)
+        if content is not None:
+            self.put(file_name, content)
+        return content
+
+    def warm_up(self, file_names):
+        for file_name in file_names:
+            if self.budget.size >= self.max_bytes:
+                break
+            if file_name not in self.entries:
+                content = self.load(file_name)
+                if content is not None and self.budget.size + len(content) <= self.max_bytes:
+                    self.put(file_name, content)
+        self.logger.info("Page cache warmed up with %s pages (%s bytes)", len(self.entries), self.size)
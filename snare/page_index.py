@@ -0,0 +1,112 @@
+import os
+import re
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+import multidict
+
+# Pattern of multiple contiguous forward slashes
+SLASHES = re.compile("/+")
+
+PageRecord = namedtuple("PageRecord", ["hash", "headers", "content_type"])
+
+
+def etag_matches(etag, if_none_match):
+    """Weak comparison of an ETag with If-None-Match, the encoded variants of the ETag match as well"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag or candidate.startswith(etag[:-1] + "-"):
+            return True
+    return False
+
+
+class PageValidator(namedtuple("PageValidator", ["etag", "last_modified", "mtime"])):
+    @classmethod
+    def create(cls, file_name, mtime, size):
+        etag = '"{}-{:x}-{:x}"'.format(file_name, int(mtime), size)
+        return cls(etag, formatdate(mtime, usegmt=True), int(mtime))
+
+    def not_modified(self, request_headers):
+        # If-None-Match takes precedence over If-Modified-Since
+        if_none_match = request_headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag_matches(self.etag, if_none_match)
+        if_modified_since = request_headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            return self.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+class PageIndex:
+    """Lookup table from request paths to the pages described in meta.json"""
+
+    def __init__(self, meta, index_page):
+        self.index_page = index_page
+        self.pages = {name: self.create_record(info) for name, info in meta.items()}
+        self.validators = {}
+        # Request paths which resolve to a page, so the common case is a single dict hit
+        self.paths = {}
+        for name in list(self.pages) + ["/"]:
+            for path in (name, name + "/"):
+                page = self.resolve(path)
+                if page is not None:
+                    self.paths[path] = page
+
+    def load_validators(self, directory, page_pack=None):
+        """Creates the ETag and Last-Modified of every stored body, Last-Modified is the clone time"""
+        validators = {}
+        if page_pack is not None:
+            mtime = os.stat(page_pack.path).st_mtime
+            for file_name, (_, length) in page_pack.files.items():
+                validators[file_name] = PageValidator.create(file_name, mtime, length)
+        else:
+            for page in self.pages.values():
+                if page.hash in validators:
+                    continue
+                try:
+                    st = os.stat(os.path.join(directory, page.hash))
+                except OSError:
+                    continue
+                validators[page.hash] = PageValidator.create(page.hash, st.st_mtime, st.st_size)
+        self.validators = validators
+
+    @staticmethod
+    def create_record(info):
+        headers = multidict.CIMultiDict()
+        for header in info.get("headers", []):
+            for key, value in header.items():
+                headers.add(key, value)
+        # overwrite headers with legacy content-type if present and not none
+        content_type = info.get("content_type")
+        if content_type:
+            headers["Content-Type"] = content_type
+        return PageRecord(info["hash"], multidict.CIMultiDictProxy(headers), headers.get("Content-Type"))
+
+    def resolve(self, requested_name):
+        requested_name = SLASHES.sub("/", requested_name)
+        possible_requests = [requested_name]
+        query_start = requested_name.find("?")
+        if query_start != -1:
+            possible_requests.append(requested_name[:query_start])
+
+        for requested_name in possible_requests:
+            if requested_name == "/":
+                requested_name = self.index_page
+            if requested_name[-1:] == "/":
+                requested_name = requested_name[:-1]
+            page = self.pages.get(unquote(requested_name))
+            if page is not None:
+                return page
+        return None
+
+    def get(self, requested_name):
+        try:
+            return self.paths[requested_name]
+        except KeyError:
+            return self.resolve(requested_name)
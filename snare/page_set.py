@@ -0,0 +1,77 @@
+import itertools
+import json
+import logging
+import os
+
+from snare.page_cache import CacheBudget, PageCache
+from snare.page_index import PageIndex
+from snare.utils.page_pack import PACK_NAME, PagePack, update_page_pack
+from snare.utils.snare_helpers import add_index_meta_tag, check_meta_file
+
+# Unique across the sites of the process, compiled templates are keyed by it
+GENERATIONS = itertools.count()
+
+
+class PageSet:
+    """
+    Snapshot of the served pages: the meta index with its validators and every cache of the page bodies.
+    A reload builds a new snapshot and swaps it in, requests finish with the snapshot they started with.
+    """
+
+    def __init__(self, meta, directory, index_page, cache_size, page_pack=None, budget=None):
+        self.meta = meta
+        self.dir = directory
+        self.index_page = index_page
+        self.page_pack = page_pack
+        self.generation = next(GENERATIONS)
+        self.index = PageIndex(meta, index_page)
+        self.index.load_validators(directory, page_pack)
+        if budget is None:
+            budget = CacheBudget(cache_size)
+        self.cache = PageCache(directory, budget=budget)
+        # the compressed variants take their memory from the same budget as the bodies
+        self.encoded_pages = PageCache(directory, budget=budget)
+        self.small_pages = set()
+        self.file_sizes = {}
+
+    def share_budget(self, budget):
+        """Takes the memory of the caches from the budget every site of the process shares"""
+        self.cache.move_to(budget)
+        self.encoded_pages.move_to(budget)
+
+    async def read(self, file_name):
+        if self.page_pack is not None:
+            return self.page_pack.get(file_name)
+        return await self.cache.read(file_name)
+
+
+def check_pages(meta_info, index_page, meta_path):
+    if not check_meta_file(meta_info) or index_page not in meta_info or "/status_404" not in meta_info:
+        raise ValueError("Error found in {}".format(meta_path))
+
+
+def load_page_set(directory, index_page, cache_size, pack=False, warm_up=False, config=None):
+    """
+    Loads meta.json and the page bodies of a new snapshot, this blocks so it belongs in an executor.
+    The pages are prepared like at startup: the index page gets the meta tags of config and the pack is
+    built again when the pages changed.
+    """
+    meta_path = os.path.join(directory, "meta.json")
+    meta_info = None
+    if not pack or os.path.exists(meta_path):
+        with open(meta_path) as meta:
+            meta_info = json.load(meta)
+        check_pages(meta_info, index_page, meta_path)
+        if config is not None and not add_index_meta_tag(directory, meta_info, index_page, config):
+            logging.getLogger(__name__).warning("Can't create meta tag, %s has no index page", directory)
+    page_pack = None
+    if pack:
+        if meta_info is not None:
+            update_page_pack(directory, meta_info)
+        page_pack = PagePack(os.path.join(directory, PACK_NAME))
+        meta_info = page_pack.meta
+        check_pages(meta_info, index_page, meta_path)
+    pages = PageSet(meta_info, directory, index_page, cache_size, page_pack=page_pack)
+    if warm_up and page_pack is None:
+        pages.cache.warm_up(page.hash for page in pages.index.pages.values())
+    return pages
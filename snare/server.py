@@ -1,31 +1,62 @@
+import asyncio
 import logging
 import aiohttp
 import aiohttp_jinja2
 import jinja2
+import multidict
 
 from aiohttp import web
 from aiohttp.web import StaticResource as StaticRoute
 
+from snare.event_batcher import EventBatcher
+from snare.event_queue import EventQueue
+from snare.metrics import Metrics
 from snare.middlewares import SnareMiddleware
+from snare.page_set import load_page_set
 from snare.tanner_handler import TannerHandler
+from snare.utils.logger import Logger
 
 
 class HttpRequestHandler:
-    def __init__(self, meta, run_args, snare_uuid, debug=False, keep_alive=75, **kwargs):
+    def __init__(self, meta, run_args, snare_uuid, debug=False, keep_alive=75, page_pack=None, **kwargs):
         self.run_args = run_args
         self.dir = run_args.full_page_path
         self.meta = meta
         self.snare_uuid = snare_uuid
         self.logger = logging.getLogger(__name__)
         self.sroute = StaticRoute(name=None, prefix="/", directory=self.dir)
-        self.tanner_handler = TannerHandler(run_args, meta, snare_uuid)
+        self.page_pack = page_pack
+        self.tanner_handler = TannerHandler(run_args, meta, snare_uuid, page_pack=page_pack)
+        self.reload_task = None
+        self.metrics = Metrics()
+        self.metrics.stages["dork_rendering"] = self.tanner_handler.html_handler.render_seconds
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics_runner = None
+        self.event_batcher = None
+        if getattr(run_args, "event_batch_size", 0) > 0:
+            self.event_batcher = EventBatcher(
+                self.tanner_handler.submit_batch,
+                max_size=run_args.event_batch_size,
+                max_linger=run_args.event_batch_linger / 1000,
+            )
+        self.event_queue = None
+        if getattr(run_args, "async_events", False):
+            self.event_queue = EventQueue(
+                self.submit_event,
+                maxsize=run_args.event_queue_size,
+                workers=run_args.event_workers,
+                overflow=run_args.event_overflow,
+            )
 
     async def submit_slurp(self, data):
         try:
             async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(verify_ssl=False)) as session:
                 r = await session.post(
-                    "https://{0}:8080/api?auth={1}&chan=snare_test&msg={2}".format(
-                        self.run_args.slurp_host, self.run_args.slurp_auth, data
+                    "https://{0}:{1}/api?auth={2}&chan=snare_test&msg={3}".format(
+                        self.run_args.slurp_host,
+                        getattr(self.run_args, "slurp_port", 8080),
+                        self.run_args.slurp_auth,
+                        data,
                     ),
                     json=data,
                     timeout=10.0,
@@ -35,26 +66,91 @@ class HttpRequestHandler:
         except Exception as e:
             self.logger.error("Error submitting slurp: %s", e)
 
+    async def submit_event(self, data):
+        if self.event_batcher is not None:
+            return await self.event_batcher.submit(data)
+        return await self.tanner_handler.submit_data(data)
+
     async def handle_request(self, request):
+        timer = self.metrics.timer()
         self.logger.info("Request path: {0}".format(request.path_qs))
+        # The whole request is served from one snapshot, even if the pages are reloaded meanwhile
+        pages = self.tanner_handler.get_pages(request.host)
+        # the error middleware renders the 404 page of the snapshot, which may be reloaded or of a virtual host
+        error_404 = pages.meta.get("/status_404")
+        if error_404 is not None:
+            if pages is self.tanner_handler.pages:
+                request["error_404"] = error_404["hash"]
+            else:
+                request["error_404"] = "{}/{}".format(pages.generation, error_404["hash"])
+            request["error_404_headers"] = error_404.get("headers", [])
         data = self.tanner_handler.create_data(request, 200)
+        timer.lap("create_data")
         if request.method == "POST":
             post_data = await request.post()
             self.logger.info("POST data:")
             for key, val in post_data.items():
                 self.logger.info("\t- {0}: {1}".format(key, val))
             data["post_data"] = dict(post_data)
+            timer.lap("post_read")
 
-        # Submit the event to the TANNER service
-        event_result = await self.tanner_handler.submit_data(data)
+        if self.event_queue is not None:
+            # Serve the page right away and let the queue workers report the event
+            await self.event_queue.put(data)
+            event_result = None
+            detection = {"type": 1}
+        else:
+            # Submit the event to the TANNER service
+            event_result = await self.submit_event(data)
+            detection = event_result["response"]["message"]["detection"]
+            self.metrics.detections[detection["type"]] += 1
+        timer.lap("submit_data")
 
         # Log the event to slurp service if enabled
         if self.run_args.slurp_enabled:
             await self.submit_slurp(request.path_qs)
+            timer.lap("slurp")
 
-        content, headers, status_code = await self.tanner_handler.parse_tanner_response(
-            request.path_qs, event_result["response"]["message"]["detection"]
+        page = None
+        if detection["type"] == 1:
+            page = pages.index.get(request.path_qs)
+        encoded_page = page_file = None
+        # only safe methods are answered from the client's copy, the others get the page as usual
+        not_modified = (
+            request.method in ("GET", "HEAD")
+            and page is not None
+            and self.tanner_handler.not_modified(page, request.headers, pages=pages)
         )
+        if not_modified:
+            # The client's copy is still valid, so the body is neither read nor rendered
+            content, headers, status_code = None, multidict.CIMultiDict(), 304
+        else:
+            if detection["type"] == 1:
+                encoded_page = await self.tanner_handler.get_encoded_page(
+                    request.path_qs, request.headers.get("Accept-Encoding"), pages=pages
+                )
+                # sendfile answers ranges and If-Modified-Since itself, which only suits the safe methods
+                if encoded_page is None and request.method in ("GET", "HEAD"):
+                    page_file = self.tanner_handler.get_page_file(request.path_qs, pages=pages)
+            if encoded_page is not None:
+                content, headers = encoded_page
+                status_code = 200
+            elif page_file is not None:
+                path, headers = page_file
+                status_code = 200
+            else:
+                content, headers, status_code = await self.tanner_handler.parse_tanner_response(
+                    request.path_qs, detection, pages=pages
+                )
+
+        # covers every way of producing the body, not only parse_tanner_response itself
+        timer.lap("parse_tanner_response")
+
+        if page is not None and status_code in (200, 304):
+            self.tanner_handler.add_validator_headers(headers, page, pages=pages)
+            if self.tanner_handler.has_encoded_variants(page):
+                # the identity body as well, so caches don't hand it to clients accepting a compressed one
+                headers["Vary"] = "Accept-Encoding"
 
         if self.run_args.server_header:
             headers["Server"] = self.run_args.server_header
@@ -69,12 +165,130 @@ class HttpRequestHandler:
             if previous_sess_uuid is None or not previous_sess_uuid.strip() or previous_sess_uuid != cur_sess_id:
                 headers.add("Set-Cookie", "sess_uuid=" + cur_sess_id)
 
+        timer.stop()
+        if page_file is not None:
+            return web.FileResponse(path, headers=headers)
         return web.Response(body=content, status=status_code, headers=headers)
 
-    async def start(self):
+    def collect_metrics(self):
+        tanner = self.tanner_handler.counters
+        yield "snare_tanner_errors_total", "counter", "Failed TANNER requests", [({}, tanner["errors"])]
+        yield "snare_tanner_fallbacks_total", "counter", "Events answered with the default detection", [
+            ({}, tanner["fallbacks"])
+        ]
+        caches = {}
+        for pages in [self.tanner_handler.pages] + list(self.tanner_handler.sites.values()):
+            caches[id(pages)] = pages.cache
+        for counter in ("hits", "misses", "evictions"):
+            total = sum(cache.counters[counter] for cache in caches.values())
+            yield "snare_page_cache_{}_total".format(counter), "counter", "Page cache " + counter, [({}, total)]
+        yield "snare_page_cache_bytes", "gauge", "Size of the cached page bodies", [
+            ({}, sum(cache.size for cache in caches.values()))
+        ]
+        dork_pool = self.tanner_handler.html_handler.dork_pool
+        for counter, value in dork_pool.counters.items():
+            yield "snare_dork_pool_{}_total".format(counter), "counter", "Dork pool " + counter, [({}, value)]
+        yield "snare_dork_pool_depth", "gauge", "Dorks waiting to be served", [({}, dork_pool.depth)]
+        if self.event_queue is not None:
+            for counter, value in self.event_queue.counters.items():
+                yield "snare_event_queue_{}_total".format(counter), "counter", "Events " + counter, [({}, value)]
+            depth = self.event_queue.queue.qsize() if self.event_queue.queue is not None else 0
+            yield "snare_event_queue_depth", "gauge", "Events waiting to be sent", [({}, depth)]
+        yield "snare_log_records_dropped_total", "counter", "Log records dropped on a full log queue", [
+            ({}, Logger.dropped_records())
+        ]
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            body=self.metrics.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def start_metrics(self):
+        # A listener of its own, so scrapes never reach the decoy site and its TANNER reporting
+        app = web.Application()
+        app.add_routes([web.get("/metrics", self.handle_metrics)])
+        self.metrics_runner = web.AppRunner(app, access_log=None)
+        await self.metrics_runner.setup()
+        site = web.TCPSite(
+            self.metrics_runner, getattr(self.run_args, "metrics_host", "127.0.0.1"), self.run_args.metrics_port
+        )
+        await site.start()
+
+    def load_packed_template(self, name):
+        page_pack = self.page_pack
+        content = page_pack.get(name)
+        if content is None:
+            return None
+        # a reload swaps the pack, which makes the templates loaded from the old one outdated
+        return bytes(content).decode("utf-8"), None, lambda: page_pack is self.page_pack
+
+    def load_site_template(self, name):
+        # Templates of the virtual hosts are named "<generation>/<file name>"
+        generation, _, file_name = name.partition("/")
+        for pages in self.tanner_handler.sites.values():
+            if str(pages.generation) == generation:
+                break
+        else:
+            return None
+        if pages.page_pack is not None:
+            content = pages.page_pack.get(file_name)
+        else:
+            content = pages.cache.load(file_name)
+        if content is None:
+            return None
+        # the template is outdated once its pages are reloaded
+        return bytes(content).decode("utf-8"), None, lambda: pages in self.tanner_handler.sites.values()
+
+    def reload(self):
+        """Rebuilds the pages in the background and swaps them in, concurrent calls share one reload"""
+        if self.reload_task is None or self.reload_task.done():
+            self.reload_task = asyncio.ensure_future(self.reload_pages())
+        return self.reload_task
+
+    async def reload_pages(self):
+        reloaded = True
+        config = self.tanner_handler.read_config()
+        snapshots = [self.tanner_handler.pages]
+        for pages in self.tanner_handler.sites.values():
+            if all(pages is not snapshot for snapshot in snapshots):
+                snapshots.append(pages)
+        for pages in snapshots:
+            try:
+                new_pages = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    load_page_set,
+                    pages.dir,
+                    pages.index_page,
+                    self.tanner_handler.cache_budget.max_bytes,
+                    pages.page_pack is not None,
+                    getattr(self.run_args, "page_cache_warmup", False),
+                    config,
+                )
+            except Exception as e:
+                self.logger.error("Error reloading the pages of %s, serving the previous ones: %s", pages.dir, e)
+                reloaded = False
+                continue
+            self.tanner_handler.swap_pages(pages, new_pages)
+            self.logger.info("Reloaded %s pages from %s", len(new_pages.meta), pages.dir)
+        self.meta = self.tanner_handler.meta
+        self.page_pack = self.tanner_handler.page_pack
+        return reloaded
+
+    async def start(self, sock=None):
+        self.tanner_handler.get_session()
+        if getattr(self.run_args, "page_cache_warmup", False) and self.page_pack is None:
+            self.tanner_handler.page_cache.warm_up(page.hash for page in self.tanner_handler.page_index.pages.values())
+        if self.event_queue is not None:
+            await self.event_queue.start()
         app = web.Application()
         app.add_routes([web.route("*", "/{tail:.*}", self.handle_request)])
-        aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader(self.dir))
+        loader = jinja2.FileSystemLoader(self.dir)
+        if self.page_pack is not None:
+            loader = jinja2.ChoiceLoader([jinja2.FunctionLoader(self.load_packed_template), loader])
+        if self.tanner_handler.sites:
+            loader = jinja2.ChoiceLoader([loader, jinja2.FunctionLoader(self.load_site_template)])
+        aiohttp_jinja2.setup(app, loader=loader)
         middleware = SnareMiddleware(
             error_404=self.meta["/status_404"].get("hash"),
             headers=self.meta["/status_404"].get("headers", []),
@@ -84,11 +298,27 @@ class HttpRequestHandler:
 
         self.runner = web.AppRunner(app)
         await self.runner.setup()
-        site = web.TCPSite(self.runner, self.run_args.host_ip, self.run_args.port)
+        if sock is not None:
+            # Listening socket inherited from the worker supervisor
+            site = web.SockSite(self.runner, sock)
+        else:
+            site = web.TCPSite(self.runner, self.run_args.host_ip, self.run_args.port)
 
         await site.start()
+        if getattr(self.run_args, "metrics_port", 0):
+            await self.start_metrics()
         names = sorted(str(s.name) for s in self.runner.sites)
         print("======== Running on {} ========\n" "(Press CTRL+C to quit)".format(", ".join(names)))
 
     async def stop(self):
         await self.runner.cleanup()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        if self.reload_task is not None and not self.reload_task.done():
+            await asyncio.gather(self.reload_task, return_exceptions=True)
+        if self.event_queue is not None:
+            await self.event_queue.stop()
+        if self.event_batcher is not None:
+            await self.event_batcher.stop()
+        await self.tanner_handler.html_handler.dork_pool.stop()
+        await self.tanner_handler.close_session()
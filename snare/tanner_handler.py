@@ -1,23 +1,128 @@
-import re
+import asyncio
+import configparser
 import os
 import multidict
 import json
 import logging
 import aiohttp
 
-from urllib.parse import unquote
-from bs4 import BeautifulSoup
+from snare.compression import available_encodings, choose_encoding, compress, is_compressible
 from snare.html_handler import HtmlHandler
+from snare.page_cache import CacheBudget
+from snare.page_set import PageSet, load_page_set
 
 
 class TannerHandler:
-    def __init__(self, run_args, meta, snare_uuid):
+    def __init__(self, run_args, meta, snare_uuid, page_pack=None):
         self.run_args = run_args
         self.meta = meta
         self.dir = run_args.full_page_path
         self.snare_uuid = snare_uuid
-        self.html_handler = HtmlHandler(run_args.no_dorks, run_args.tanner)
+        # one memory budget for the page caches of every site
+        self.cache_budget = CacheBudget(getattr(run_args, "page_cache_size", 64) * 1024 * 1024)
+        self.pages = PageSet(
+            meta,
+            self.dir,
+            getattr(run_args, "index_page", "/index.html"),
+            self.cache_budget.max_bytes,
+            page_pack=page_pack,
+            budget=self.cache_budget,
+        )
+        self.sites = self.load_sites(getattr(run_args, "vhosts", None) or [], page_pack is not None)
+        self.sendfile_min_size = getattr(run_args, "sendfile_min_size", 0) * 1024
+        self.compression = getattr(run_args, "compression", False)
+        self.compression_min_size = 256
+        self.tanner_port = getattr(run_args, "tanner_port", 8090)
+        self.html_handler = HtmlHandler(
+            run_args.no_dorks,
+            run_args.tanner,
+            dorks_low_watermark=getattr(run_args, "dorks_low_watermark", 20),
+            tanner_port=self.tanner_port,
+        )
+        self.counters = dict(errors=0, fallbacks=0)
         self.logger = logging.getLogger(__name__)
+        self.session = None
+        # cleared once tanner answers the batch endpoint with 404, batches are then sent event by event
+        self.batch_supported = True
+
+    @property
+    def page_index(self):
+        return self.pages.index
+
+    @property
+    def page_cache(self):
+        return self.pages.cache
+
+    @property
+    def page_pack(self):
+        return self.pages.page_pack
+
+    def read_config(self):
+        """The snare config with the meta tags of the index pages, read again on every reload"""
+        config = configparser.ConfigParser()
+        config.read(getattr(self.run_args, "config_path", None) or [])
+        return config if config.has_section("WEB-TOOLS") else None
+
+    def load_sites(self, vhosts, pack):
+        """Loads the pages of every virtual host, hosts serving the same page directory share them"""
+        sites = {}
+        loaded = {}
+        config = self.read_config() if vhosts else None
+        for host, directory, index_page in vhosts:
+            key = (directory, index_page)
+            if key not in loaded:
+                loaded[key] = load_page_set(
+                    directory,
+                    index_page,
+                    self.cache_budget.max_bytes,
+                    pack=pack,
+                    warm_up=getattr(self.run_args, "page_cache_warmup", False),
+                    config=config,
+                )
+                loaded[key].share_budget(self.cache_budget)
+            sites[host.lower()] = loaded[key]
+        return sites
+
+    def get_pages(self, host):
+        """Returns the pages of the site named by the Host header, unknown hosts get the default site"""
+        if not self.sites or not host:
+            return self.pages
+        host = host.lower().rstrip(".")
+        port = host.rfind(":")
+        if port > host.rfind("]"):
+            host = host[:port].rstrip(".")
+        return self.sites.get(host, self.pages)
+
+    def swap_pages(self, previous, pages):
+        """Serves new requests from pages, requests in flight keep the snapshot they started with"""
+        # the bodies of the previous snapshot stay cached for requests in flight until the budget evicts them
+        pages.share_budget(self.cache_budget)
+        if self.pages is previous:
+            self.pages = pages
+            self.meta = pages.meta
+        for host, site in self.sites.items():
+            if site is previous:
+                self.sites[host] = pages
+        # templates are keyed by generation, so in-flight requests can't bring stale ones back
+        self.html_handler.templates = {}
+        self.html_handler.payload_templates = {}
+
+    def get_session(self):
+        # One keep-alive connection pool is shared by every TANNER call
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=getattr(self.run_args, "tanner_pool_size", 100),
+                limit_per_host=getattr(self.run_args, "tanner_pool_per_host", 0),
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+            self.html_handler.session = self.session
+        return self.session
+
+    async def close_session(self):
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+        self.html_handler.session = None
 
     def create_data(self, request, response_status):
         data = dict(
@@ -48,110 +153,199 @@ class TannerHandler:
     async def submit_data(self, data):
         event_result = None
         try:
-            async with aiohttp.ClientSession() as session:
-                r = await session.post(
-                    "http://{0}:8090/event".format(self.run_args.tanner),
-                    json=data,
-                    timeout=10.0,
-                )
-                try:
-                    event_result = await r.json()
-                except (
-                    json.decoder.JSONDecodeError,
-                    aiohttp.client_exceptions.ContentTypeError,
-                ) as e:
-                    self.logger.error("Error submitting data: {} {}".format(e, data))
-                    event_result = {
-                        "version": "0.6.0",
-                        "response": {
-                            "message": {
-                                "detection": {
-                                    "name": "index",
-                                    "order": 1,
-                                    "type": 1,
-                                    "version": "0.6.0",
-                                },
-                                "sess_uuid": data["uuid"],
-                            }
-                        },
-                    }
-                finally:
-                    await r.release()
+            session = self.get_session()
+            r = await session.post(
+                "http://{0}:{1}/event".format(self.run_args.tanner, self.tanner_port),
+                json=data,
+                timeout=10.0,
+            )
+            try:
+                event_result = await r.json()
+            except (
+                json.decoder.JSONDecodeError,
+                aiohttp.client_exceptions.ContentTypeError,
+            ) as e:
+                self.logger.error("Error submitting data: {} {}".format(e, data))
+                self.counters["fallbacks"] += 1
+                event_result = self.default_event_result(data)
+            finally:
+                await r.release()
         except Exception as e:
+            self.counters["errors"] += 1
             self.logger.exception("Exception: %s", e)
             raise e
         return event_result
 
-    async def parse_tanner_response(self, requested_name, detection):
+    async def submit_batch(self, events):
+        """Submits several events in one request, results keep the order of the events"""
+        if not self.batch_supported:
+            return await self.submit_each(events)
+        event_results = None
+        try:
+            session = self.get_session()
+            r = await session.post(
+                "http://{0}:{1}/events".format(self.run_args.tanner, self.tanner_port),
+                json=events,
+                timeout=10.0,
+            )
+            try:
+                if r.status == 404:
+                    self.logger.warning("Tanner has no batch endpoint, submitting events one by one")
+                    self.batch_supported = False
+                else:
+                    batch_result = await r.json()
+                    event_results = [
+                        {"version": batch_result["version"], "response": {"message": message}}
+                        for message in batch_result["response"]["messages"]
+                    ]
+            except (
+                json.decoder.JSONDecodeError,
+                aiohttp.client_exceptions.ContentTypeError,
+                KeyError,
+                TypeError,
+            ) as e:
+                self.logger.error("Error submitting batch of {} events: {}".format(len(events), e))
+                event_results = []
+            finally:
+                await r.release()
+        except Exception as e:
+            self.counters["errors"] += 1
+            self.logger.exception("Exception: %s", e)
+            raise e
+        if not self.batch_supported:
+            return await self.submit_each(events)
+        if len(event_results) < len(events):
+            if event_results:
+                self.logger.error("Tanner returned {} results for {} events".format(len(event_results), len(events)))
+            self.counters["fallbacks"] += len(events) - len(event_results)
+            event_results.extend(self.default_event_result(data) for data in events[len(event_results) :])
+        return event_results[: len(events)]
+
+    async def submit_each(self, events):
+        """Submits a batch of events to tanner's single event endpoint"""
+        return await asyncio.gather(*[self.submit_data(data) for data in events])
+
+    @staticmethod
+    def default_event_result(data):
+        return {
+            "version": "0.6.0",
+            "response": {
+                "message": {
+                    "detection": {
+                        "name": "index",
+                        "order": 1,
+                        "type": 1,
+                        "version": "0.6.0",
+                    },
+                    "sess_uuid": data["uuid"],
+                }
+            },
+        }
+
+    def get_page_file(self, requested_name, pages=None):
+        """Returns path and headers of a large non-HTML page, such pages are sent without reading them"""
+        pages = pages or self.pages
+        if not self.sendfile_min_size or pages.page_pack is not None:
+            return None
+        page = pages.index.get(requested_name)
+        if page is None or (page.content_type or "").startswith("text/html"):
+            return None
+        path = os.path.join(pages.dir, page.hash)
+        size = pages.file_sizes.get(page.hash)
+        if size is None:
+            size = os.path.getsize(path) if os.path.isfile(path) else -1
+            pages.file_sizes[page.hash] = size
+        if size < self.sendfile_min_size:
+            return None
+        return path, multidict.CIMultiDict(page.headers)
+
+    def has_encoded_variants(self, page):
+        """Whether the page may be served compressed, every response of it then varies on Accept-Encoding"""
+        if not self.compression or not is_compressible(page.content_type):
+            return False
+        # HTML with dorks is different for every response
+        return not page.content_type.startswith("text/html") or self.html_handler.no_dorks is True
+
+    async def get_encoded_page(self, requested_name, accept_encoding, pages=None):
+        """Returns a compressed body and headers for static text pages the client accepts compressed"""
+        if not self.compression or not accept_encoding:
+            return None
+        pages = pages or self.pages
+        page = pages.index.get(requested_name)
+        if page is None or page.hash in pages.small_pages or not self.has_encoded_variants(page):
+            return None
+        html = page.content_type.startswith("text/html")
+        encoding = choose_encoding(accept_encoding, available_encodings())
+        if encoding is None:
+            return None
+        key = "{}.{}".format(page.hash, encoding)
+        content = pages.encoded_pages.get(key)
+        if content is None:
+            content = await pages.read(page.hash)
+            if content is None:
+                return None
+            if html:
+                content = await self.html_handler.handle_content(bytes(content), key=(pages.generation, page.hash))
+            if len(content) < self.compression_min_size:
+                pages.small_pages.add(page.hash)
+                return None
+            content = await asyncio.get_event_loop().run_in_executor(None, compress, content, encoding)
+            pages.encoded_pages.put(key, content)
+        headers = multidict.CIMultiDict(page.headers)
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+        return content, headers
+
+    def not_modified(self, page, request_headers, pages=None):
+        """Whether the client's copy of the page is still valid, decided without reading the body"""
+        validator = (pages or self.pages).index.validators.get(page.hash)
+        return validator is not None and validator.not_modified(request_headers)
+
+    def add_validator_headers(self, headers, page, pages=None):
+        validator = (pages or self.pages).index.validators.get(page.hash)
+        if validator is None:
+            return
+        etag = validator.etag
+        encoding = headers.get("Content-Encoding")
+        if encoding:
+            etag = '{}-{}"'.format(etag[:-1], encoding)
+        elif (page.content_type or "").startswith("text/html") and self.html_handler.no_dorks is not True:
+            # the dorks differ between responses, so the bodies are only equivalent
+            etag = "W/" + etag
+        headers["ETag"] = etag
+        headers["Last-Modified"] = validator.last_modified
+
+    async def parse_tanner_response(self, requested_name, detection, pages=None):
         content = None
         status_code = 200
         headers = multidict.CIMultiDict()
-        # Creating a regex object for the pattern of multiple contiguous forward slashes
-        p = re.compile("/+")
-        # Substituting all occurrences of the pattern with single forward slash
-        requested_name = p.sub("/", requested_name)
+        pages = pages or self.pages
 
         if detection["type"] == 1:
-            possible_requests = [requested_name]
-            query_start = requested_name.find("?")
-            if query_start != -1:
-                possible_requests.append(requested_name[:query_start])
-
-            file_name = None
-            for requested_name in possible_requests:
-                if requested_name == "/":
-                    requested_name = self.run_args.index_page
-                if requested_name[-1] == "/":
-                    requested_name = requested_name[:-1]
-                requested_name = unquote(requested_name)
-                try:
-                    file_name = self.meta[requested_name]["hash"]
-                    for header in self.meta[requested_name].get("headers", []):
-                        for key, value in header.items():
-                            headers.add(key, value)
-                    # overwrite headers with legacy content-type if present and not none
-                    content_type = self.meta[requested_name].get("content_type")
-                    if content_type:
-                        headers["Content-Type"] = content_type
-                except KeyError:
-                    pass
-                else:
-                    break
-
-            if not file_name:
+            page = pages.index.get(requested_name)
+            if page is None:
                 status_code = 404
             else:
-                path = os.path.join(self.dir, file_name)
-                if os.path.isfile(path):
-                    with open(path, "rb") as fh:
-                        content = fh.read()
-                    if headers.get("Content-Type", "").startswith("text/html"):
-                        content = await self.html_handler.handle_content(content)
+                headers.extend(page.headers)
+                content = await pages.read(page.hash)
+                if content is not None and (page.content_type or "").startswith("text/html"):
+                    content = await self.html_handler.handle_content(bytes(content), key=(pages.generation, page.hash))
 
         elif detection["type"] == 2:
             payload_content = detection["payload"]
             if payload_content["page"]:
-                try:
-                    file_name = self.meta[payload_content["page"]]["hash"]
-                    for header in self.meta[payload_content["page"]].get("headers", []):
-                        for key, value in header.items():
-                            headers.add(key, value)
-                    # overwrite headers with legacy content-type if present and not none
-                    content_type = self.meta[payload_content["page"]].get("content_type")
-                    if content_type:
-                        headers["Content-Type"] = content_type
-                    page_path = os.path.join(self.dir, file_name)
-                    with open(page_path, encoding="utf-8") as p:
-                        content = p.read()
-                except KeyError:
-                    content = "<html><body></body></html>"
+                page = pages.index.pages.get(payload_content["page"])
+                if page is not None:
+                    headers.extend(page.headers)
+                    content = await pages.read(page.hash)
+                    if content is None:
+                        raise FileNotFoundError(os.path.join(pages.dir, page.hash))
+                    content = self.html_handler.inject_payload(
+                        content, payload_content["value"], key=(pages.generation, page.hash)
+                    )
+                else:
                     headers["Content-Type"] = "text/html"
-
-                soup = BeautifulSoup(content, "html.parser")
-                script_tag = soup.new_tag("div")
-                script_tag.append(BeautifulSoup(payload_content["value"], "html.parser"))
-                soup.body.append(script_tag)
-                content = str(soup).encode()
+                    content = self.html_handler.inject_payload(b"<html><body></body></html>", payload_content["value"])
             else:
                 content_type = "text/plain"
                 if content_type:
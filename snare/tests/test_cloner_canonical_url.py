@@ -0,0 +1,119 @@
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import yarl
+from snare.cloner import Cloner
+from snare.page_index import PageIndex
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestCanonicalUrl(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.handler = Cloner("http://example.com", sys.maxsize, "false")
+
+    def test_variants(self):
+        urls = [
+            "http://example.com/page/?a=1&b=2",
+            "http://example.com:80/page?a=1&b=2#section",
+            "HTTP://EXAMPLE.com/page?a=1&b=2",
+        ]
+        keys = {self.handler.canonical_url(yarl.URL(url)) for url in urls}
+        self.assertEqual(keys, {"http://example.com/page?a=1&b=2"})
+
+    def test_distinct(self):
+        urls = [
+            "http://example.com/",
+            "https://example.com/",
+            "http://example.com:8080/",
+            "http://example.com/page?a=1",
+            "http://example.com/page?a=2",
+            "http://example.com/page?a=1&b=2",
+            "http://example.com/page?b=2&a=1",
+            "http://example.com/page?a=1&a=0",
+            "http://example.com/page?a=0&a=1",
+            "http://example.com/Page",
+        ]
+        keys = {self.handler.canonical_url(yarl.URL(url)) for url in urls}
+        self.assertEqual(len(keys), len(urls))
+
+    def test_root(self):
+        self.assertEqual(self.handler.canonical_url(yarl.URL("http://example.com")), "http://example.com/")
+
+    def test_enqueue_once(self):
+        async def test():
+            for url in ["/page?a=1&b=2", "/page/?a=1&b=2", "http://example.com/page?a=1&b=2#top"]:
+                await self.handler.process_link(url, 0)
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(self.handler.new_urls.qsize(), 1)
+        self.assertEqual(self.handler.queued_urls, {"http://example.com/page?a=1&b=2"})
+
+    def test_skip_visited(self):
+        self.handler.visited_urls.add("http://example.com/page")
+
+        async def test():
+            await self.handler.process_link("/page/#top", 0)
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(self.handler.new_urls.qsize(), 0)
+
+    def tearDown(self):
+        self.loop.close()
+
+
+class FakeResponse:
+    def __init__(self, url):
+        self.body = PAGES[url.path_qs]
+        self.content_type = "text/html"
+        self.headers = {"Content-Type": self.content_type}
+        self.content_length = len(self.body)
+
+    async def read(self):
+        return self.body
+
+    async def release(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    async def get(self, url, **kwargs):
+        return FakeResponse(url)
+
+
+PAGES = {
+    "/": b'<html><body><a href="/x?b=2&amp;a=1">ba</a><a href="/x?a=1&amp;b=2">ab</a></body></html>',
+    "/x?b=2&a=1": b"<html><body>b then a</body></html>",
+    "/x?a=1&b=2": b"<html><body>a then b</body></html>",
+}
+
+
+class TestCloneQueries(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.loop = asyncio.new_event_loop()
+
+    def test_serve_both_orders(self):
+        cloner = Cloner("http://example.com", sys.maxsize, "false", default_path=self.main_page_path, workers=2)
+
+        async def test():
+            await cloner.new_urls.put((cloner.root, 0))
+            await cloner.get_body(FakeSession())
+
+        self.loop.run_until_complete(test())
+        index = PageIndex(cloner.meta, "/index.html")
+        for path, body in (("/x?b=2&a=1", b"b then a"), ("/x?a=1&b=2", b"a then b")):
+            page = index.get(path)
+            self.assertIsNotNone(page)
+            with open(os.path.join(cloner.target_path, page.hash), "rb") as fh:
+                self.assertIn(body, fh.read())
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
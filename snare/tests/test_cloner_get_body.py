@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 import aiohttp
 import yarl
 import sys
@@ -18,6 +19,7 @@ class TestGetBody(unittest.TestCase):
         self.level = 0
         self.max_depth = sys.maxsize
         self.loop = asyncio.new_event_loop()
+        self.addCleanup(patch.stopall)
         self.css_validate = "false"
         self.handler = Cloner(self.root, self.max_depth, self.css_validate)
         self.target_path = "/opt/snare/pages/{}".format(yarl.URL(self.root).host)
@@ -33,25 +35,29 @@ class TestGetBody(unittest.TestCase):
         self.q_size = None
 
         self.session = aiohttp.ClientSession
-        self.session.get = AsyncMock(
-            return_value=aiohttp.ClientResponse(
-                url=yarl.URL("http://www.example.com"),
-                method="GET",
-                writer=None,
-                continue100=1,
-                timer=None,
-                request_info=None,
-                traces=None,
-                loop=self.loop,
-                session=None,
-            )
-        )
+        patch.object(
+            self.session,
+            "get",
+            AsyncMock(
+                return_value=aiohttp.ClientResponse(
+                    url=yarl.URL("http://www.example.com"),
+                    method="GET",
+                    writer=None,
+                    continue100=1,
+                    timer=None,
+                    request_info=None,
+                    traces=None,
+                    loop=self.loop,
+                    session=None,
+                )
+            ),
+        ).start()
 
     def test_get_body(self):
         self.content = b"""<html><body><a href="http://example.com/test"></a></body></html>"""
 
-        aiohttp.ClientResponse._headers = {"Content-Type": "text/html"}
-        aiohttp.ClientResponse.read = AsyncMock(return_value=self.content)
+        patch.object(aiohttp.ClientResponse, "_headers", {"Content-Type": "text/html"}).start()
+        patch.object(aiohttp.ClientResponse, "read", AsyncMock(return_value=self.content)).start()
         self.filename, self.hashname = self.handler._make_filename(yarl.URL(self.root))
         self.expected_content = '<html><body><a href="/test"></a></body></html>'
 
@@ -79,18 +85,18 @@ class TestGetBody(unittest.TestCase):
 
         self.assertEqual(self.return_content, self.expected_content)
         self.assertEqual(
-            self.handler.visited_urls[-2:],
-            ["http://example.com/", "http://example.com/test"],
+            self.handler.visited_urls,
+            {"http://example.com/", "http://example.com/test"},
         )
         self.assertEqual(self.handler.meta, self.meta)
 
     def test_get_body_css_validate(self):
-        aiohttp.ClientResponse._headers = {"Content-Type": "text/css"}
+        patch.object(aiohttp.ClientResponse, "_headers", {"Content-Type": "text/css"}).start()
 
         self.css_validate = "true"
         self.handler = Cloner(self.root, self.max_depth, self.css_validate)
         self.content = b""".banner { background: url("/example.png") }"""
-        aiohttp.ClientResponse.read = AsyncMock(return_value=self.content)
+        patch.object(aiohttp.ClientResponse, "read", AsyncMock(return_value=self.content)).start()
         self.expected_content = "http://example.com/example.png"
         self.return_size = 0
         self.meta = {
@@ -110,12 +116,12 @@ class TestGetBody(unittest.TestCase):
             self.q_size = self.handler.new_urls.qsize()
 
         self.loop.run_until_complete(test())
-        self.assertEqual(self.handler.visited_urls[-1], self.expected_content)
+        self.assertIn(self.expected_content, self.handler.visited_urls)
         self.assertEqual(self.q_size, self.return_size)
         self.assertEqual(self.meta, self.handler.meta)
 
     def test_get_body_css_validate_scheme(self):
-        aiohttp.ClientResponse._headers = {"Content-Type": "text/css"}
+        patch.object(aiohttp.ClientResponse, "_headers", {"Content-Type": "text/css"}).start()
 
         self.css_validate = "true"
         self.return_size = 0
@@ -139,14 +145,14 @@ class TestGetBody(unittest.TestCase):
             self.q_size = self.handler.new_urls.qsize()
 
         for content in self.content:
-            aiohttp.ClientResponse.read = AsyncMock(return_value=content)
+            patch.object(aiohttp.ClientResponse, "read", AsyncMock(return_value=content)).start()
             self.loop.run_until_complete(test())
             self.assertEqual(self.return_size, self.q_size)
             self.assertEqual(self.handler.meta, self.meta)
-            self.assertEqual(self.handler.visited_urls[-1], self.expected_content)
+            self.assertIn(self.expected_content, self.handler.visited_urls)
 
     def test_client_error(self):
-        self.session.get = AsyncMock(side_effect=aiohttp.ClientError)
+        patch.object(self.session, "get", AsyncMock(side_effect=aiohttp.ClientError)).start()
 
         async def test():
             await self.handler.new_urls.put((yarl.URL(self.root), 0))
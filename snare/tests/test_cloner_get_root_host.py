@@ -19,11 +19,23 @@ class TestClonerGetRootHost(unittest.TestCase):
         self.css_validate = "false"
         self.handler = Cloner(self.root, self.max_depth, self.css_validate)
         self.expected_moved_root = URL("http://www.example.com")
+        response = aiohttp.ClientResponse(
+            url=self.expected_moved_root,
+            method="GET",
+            writer=None,
+            continue100=1,
+            timer=None,
+            request_info=None,
+            traces=None,
+            loop=self.loop,
+            session=None,
+        )
 
         async def test():
             await self.handler.get_root_host()
 
-        self.loop.run_until_complete(test())
+        with mock.patch.object(aiohttp.ClientSession, "get", AsyncMock(return_value=response)):
+            self.loop.run_until_complete(test())
 
         self.assertEqual(self.handler.moved_root, self.expected_moved_root)
 
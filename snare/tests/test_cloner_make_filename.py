@@ -37,5 +37,11 @@ class TestMakeFilename(unittest.TestCase):
         self.assertEqual(self.filename, "/images")
         self.assertEqual(self.hashname, "41389bcf7f7427468d8c8675db2d4f98")
 
+    def test_make_filename_trailing_slash(self):
+        for url in ("http://example.com/dir/", "http://example.com/dir", "/dir/"):
+            self.assertEqual(self.handler._make_filename(yarl.URL(url))[0], "/dir")
+        self.assertEqual(self.handler._make_filename(yarl.URL("http://example.com/dir/?a=1"))[0], "/dir?a=1")
+        self.assertEqual(self.handler._make_filename(yarl.URL("http://example.com//"))[0], "/index.html")
+
     def tearDown(self):
         shutil.rmtree(self.main_page_path)
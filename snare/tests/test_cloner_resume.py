@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+import json
+import os
+import shutil
+from unittest.mock import patch
+from snare.cloner import Cloner, JOURNAL_NAME
+from snare.tests.test_cloner_workers import FakeSession
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class InterruptedSession(FakeSession):
+    """Fails the request after the given number of requests, like a clone that was killed"""
+
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.fail_after = fail_after
+
+    async def get(self, url, **kwargs):
+        if self.fail_after is not None and len(self.requests) >= self.fail_after:
+            raise RuntimeError("killed")
+        return await super().get(url, **kwargs)
+
+    async def close(self):
+        pass
+
+
+class TestClonerResume(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.loop = asyncio.new_event_loop()
+
+    def clone(self, session, resume=False, max_depth=10):
+        cloner = Cloner("http://example.com", max_depth, "false", default_path=self.main_page_path, workers=1)
+        with patch("snare.cloner.aiohttp.ClientSession", return_value=session):
+            self.loop.run_until_complete(cloner.run(resume=resume))
+        return cloner
+
+    def read_meta(self, cloner):
+        with open(os.path.join(cloner.target_path, "meta.json")) as fh:
+            return json.load(fh)
+
+    def test_resume(self):
+        full = self.clone(InterruptedSession())
+        full_meta = self.read_meta(full)
+        shutil.rmtree(full.target_path)
+
+        interrupted = InterruptedSession(fail_after=4)
+        with self.assertRaises(RuntimeError):
+            self.clone(interrupted)
+        self.assertTrue(os.path.exists(os.path.join(full.target_path, JOURNAL_NAME)))
+        self.assertEqual(len(self.read_meta(full)), 4)
+
+        resumed = InterruptedSession()
+        cloner = self.clone(resumed, resume=True)
+        self.assertEqual(self.read_meta(cloner), full_meta)
+        self.assertEqual(cloner.counter, len(full_meta))
+        # nothing cloned before the interruption is fetched again
+        self.assertEqual(set(interrupted.requests) & set(resumed.requests), set())
+        self.assertEqual(len(interrupted.requests) + len(resumed.requests), len(full_meta))
+        self.assertFalse(os.path.exists(os.path.join(cloner.target_path, JOURNAL_NAME)))
+
+    def test_resume_keeps_depth(self):
+        full = self.clone(InterruptedSession(), max_depth=2)
+        full_meta = self.read_meta(full)
+        shutil.rmtree(full.target_path)
+
+        with self.assertRaises(RuntimeError):
+            self.clone(InterruptedSession(fail_after=3), max_depth=2)
+        cloner = self.clone(InterruptedSession(), resume=True, max_depth=2)
+        self.assertEqual(self.read_meta(cloner), full_meta)
+
+    def test_cut_off_record(self):
+        with self.assertRaises(RuntimeError):
+            self.clone(InterruptedSession(fail_after=2))
+        journal_path = os.path.join(self.main_page_path, "pages", "example.com", JOURNAL_NAME)
+        with open(journal_path, "a") as fh:
+            fh.write('{"done": "http://exa')
+        cloner = self.clone(InterruptedSession(), resume=True)
+        self.assertEqual(len(self.read_meta(cloner)), 12)
+
+    def test_without_journal(self):
+        with self.assertLogs(level="WARNING") as log:
+            cloner = self.clone(InterruptedSession(), resume=True)
+        self.assertIn("to resume from, cloning from the root", log.output[0])
+        self.assertEqual(len(self.read_meta(cloner)), 12)
+
+    def test_new_clone_ignores_journal(self):
+        with self.assertRaises(RuntimeError):
+            self.clone(InterruptedSession(fail_after=4))
+        session = InterruptedSession()
+        self.clone(session)
+        self.assertEqual(len(session.requests), 12)
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
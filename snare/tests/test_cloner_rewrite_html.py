@@ -0,0 +1,43 @@
+import unittest
+import yarl
+from snare.cloner import find_css_urls, rewrite_html
+
+ROOT = yarl.URL("http://example.com")
+
+
+class TestRewriteHtml(unittest.TestCase):
+    def test_rewrite_links(self):
+        data = (
+            b'<html><body><a href="http://example.com/test">test</a><a href="http://other.com/">other</a>'
+            b'<img src="http://cdn.example.org/smiley.png"><form action="/submit.php"></form>'
+            b'<input name="redirect_to" value="http://example.com/admin"></body></html>'
+        )
+        page, found = rewrite_html(data, ROOT, None)
+        self.assertEqual(
+            page,
+            b'<html><body><a href="/test">test</a><a href="http://other.com/">other</a>'
+            b'<img src="/smiley.png"/><form action="/submit.php"></form>'
+            b'<input name="redirect_to" value="/admin"/></body></html>',
+        )
+        self.assertEqual(
+            found,
+            [
+                yarl.URL("http://example.com/test"),
+                yarl.URL("http://cdn.example.org/smiley.png"),
+                yarl.URL("http://example.com/submit.php"),
+            ],
+        )
+
+    def test_moved_root(self):
+        page, found = rewrite_html(b'<a href="/test">test</a>', ROOT, yarl.URL("http://www.example.com"))
+        self.assertEqual(page, b'<a href="/test">test</a>')
+        self.assertEqual(found, [yarl.URL("http://www.example.com/test")])
+
+    def test_skipped_schemes(self):
+        page, found = rewrite_html(b'<img src="data:image/png;base64,AAAA">', ROOT, None)
+        self.assertEqual(page, b'<img src="data:image/png;base64,AAAA"/>')
+        self.assertEqual(found, [])
+
+    def test_find_css_urls(self):
+        data = b'.a { background: url("/a.png") } .b { background: url("data:image/png;base64,AAAA") }'
+        self.assertEqual(find_css_urls(data, ROOT, False), [yarl.URL("http://example.com/a.png")])
@@ -0,0 +1,115 @@
+import unittest
+import asyncio
+import hashlib
+import os
+import shutil
+import yarl
+from snare.cloner import Cloner
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class FakeStream:
+    def __init__(self, body):
+        self.body = body
+        self.chunks = 0
+
+    async def iter_chunked(self, size):
+        for offset in range(0, len(self.body), size):
+            self.chunks += 1
+            yield self.body[offset : offset + size]
+
+
+class FakeResponse:
+    def __init__(self, content_type, body, content_length=None):
+        self.content_type = content_type
+        self.headers = {"Content-Type": content_type}
+        self.content = FakeStream(body)
+        self.content_length = content_length
+        self.closed = False
+        self.released = False
+
+    async def read(self):
+        return self.content.body
+
+    async def release(self):
+        self.released = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    async def get(self, url, **kwargs):
+        return self.response
+
+
+class TestStoreBody(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.loop = asyncio.new_event_loop()
+        self.url = yarl.URL("http://example.com/video.mp4")
+
+    def get_page(self, response, **kwargs):
+        self.handler = Cloner("http://example.com", 10, "false", default_path=self.main_page_path, **kwargs)
+        self.file_name, self.hash_name = self.handler._make_filename(self.url)
+        self.loop.run_until_complete(self.handler.get_page(FakeSession(response), self.url, 0))
+        return os.listdir(self.handler.target_path)
+
+    def test_stream_to_file(self):
+        body = os.urandom(200 * 1024)
+        response = FakeResponse("video/mp4", body, len(body))
+        files = self.get_page(response, checksum=True)
+        self.assertEqual(files, [self.hash_name])
+        with open(os.path.join(self.handler.target_path, self.hash_name), "rb") as fh:
+            self.assertEqual(fh.read(), body)
+        self.assertEqual(response.content.chunks, 4)
+        self.assertTrue(response.released)
+        self.assertEqual(self.handler.meta[self.file_name]["sha256"], hashlib.sha256(body).hexdigest())
+
+    def test_no_checksum(self):
+        self.get_page(FakeResponse("video/mp4", b"video"))
+        self.assertNotIn("sha256", self.handler.meta[self.file_name])
+
+    def test_checksum_of_rewritten_page(self):
+        self.url = yarl.URL("http://example.com/page.html")
+        self.get_page(FakeResponse("text/html", b'<a href="http://example.com/a">a</a>'), checksum=True)
+        self.assertEqual(self.handler.meta["/page.html"]["sha256"], hashlib.sha256(b'<a href="/a">a</a>').hexdigest())
+
+    def test_content_length_too_large(self):
+        response = FakeResponse("video/mp4", b"x" * 100, content_length=100)
+        with self.assertLogs(level="WARNING") as log:
+            files = self.get_page(response, max_body_size=99)
+        self.assertIn("Skipped http://example.com/video.mp4: body larger than 99 bytes", log.output[0])
+        self.assertEqual(files, [])
+        self.assertEqual(self.handler.meta, {})
+        self.assertEqual(response.content.chunks, 0)
+        self.assertTrue(response.closed)
+
+    def test_stream_too_large(self):
+        response = FakeResponse("video/mp4", b"x" * 200 * 1024)
+        with self.assertLogs(level="WARNING"):
+            files = self.get_page(response, max_body_size=100 * 1024)
+        self.assertEqual(files, [])
+        self.assertEqual(self.handler.meta, {})
+        self.assertEqual(response.content.chunks, 2)
+
+    def test_html_too_large(self):
+        self.url = yarl.URL("http://example.com/page.html")
+        response = FakeResponse("text/html", b"<p>page</p>" * 20000)
+        with self.assertLogs(level="WARNING"):
+            files = self.get_page(response, max_body_size=100 * 1024)
+        self.assertEqual(files, [])
+        self.assertEqual(self.handler.counter, 0)
+
+    def test_within_limit(self):
+        body = b"x" * 100
+        self.get_page(FakeResponse("video/mp4", body, len(body)), max_body_size=100)
+        self.assertIn(self.file_name, self.handler.meta)
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
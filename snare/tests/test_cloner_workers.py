@@ -0,0 +1,182 @@
+import unittest
+from unittest.mock import Mock, patch
+import asyncio
+import os
+import shutil
+import yarl
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from snare.cloner import Cloner
+from snare.utils.page_path_generator import generate_unique_path
+
+SITE = {
+    "/": b'<html><body><a href="/a">a</a><a href="/b">b</a><a href="/c">c</a></body></html>',
+    "/a": b'<html><body><a href="/d">d</a><img src="http://cdn.example.org/a.png"></body></html>',
+    "/b": b'<html><body><a href="/d">d</a><link href="/style.css"><img src="http://cdn.example.org/b.png"></body></html>',
+    "/c": b'<html><body><a href="/e">e</a><a href="/">home</a></body></html>',
+    "/d": b'<html><body><a href="/f">f</a></body></html>',
+    "/e": b'<html><body><a href="/d">d</a></body></html>',
+    "/f": b"<html><body>deepest</body></html>",
+    "/style.css": b'.banner { background: url("/banner.png") }',
+}
+
+
+class FakeStream:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for offset in range(0, len(self.body), size):
+            yield self.body[offset : offset + size]
+
+
+class FakeResponse:
+    def __init__(self, path):
+        self.content_type = "text/css" if path.endswith(".css") else "text/html"
+        if path.endswith(".png"):
+            self.content_type = "image/png"
+        self.headers = {"Content-Type": self.content_type}
+        self.body = SITE.get(path, b"png")
+        self.content_length = len(self.body)
+        self.content = FakeStream(self.body)
+        self.closed = False
+
+    async def read(self):
+        return self.body
+
+    async def release(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ProcessPool(ProcessPoolExecutor):
+    """Pool with the shutdown of the Python versions before 3.9"""
+
+    shutdowns = []
+
+    def shutdown(self, wait=True):
+        self.shutdowns.append(wait)
+        super().shutdown(wait=wait)
+
+
+class FakeSession:
+    """Answers from SITE after a delay and records the requests in flight per host"""
+
+    def __init__(self):
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self.requests = []
+
+    async def get(self, url, **kwargs):
+        self.requests.append(url)
+        self.in_flight[url.host] += 1
+        self.max_in_flight[url.host] = max(self.max_in_flight[url.host], self.in_flight[url.host])
+        self.max_in_flight["total"] = max(self.max_in_flight["total"], sum(self.in_flight.values()))
+        await asyncio.sleep(0.01)
+        self.in_flight[url.host] -= 1
+        return FakeResponse(url.path)
+
+
+class TestClonerWorkers(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.loop = asyncio.new_event_loop()
+
+    def clone(self, max_depth=10, **kwargs):
+        cloner = Cloner("http://example.com", max_depth, "false", default_path=self.main_page_path, **kwargs)
+        session = FakeSession()
+
+        async def test():
+            await cloner.new_urls.put((cloner.root, 0))
+            await cloner.get_body(session)
+
+        self.loop.run_until_complete(test())
+        files = {}
+        for name in os.listdir(cloner.target_path):
+            with open(os.path.join(cloner.target_path, name), "rb") as fh:
+                files[name] = fh.read()
+        shutil.rmtree(cloner.target_path)
+        return cloner, session, files
+
+    def test_same_output_as_sequential(self):
+        sequential, _, sequential_files = self.clone(workers=1)
+        concurrent, session, concurrent_files = self.clone(workers=4)
+        self.assertEqual(concurrent.meta, sequential.meta)
+        self.assertEqual(concurrent_files, sequential_files)
+        self.assertEqual(concurrent.visited_urls, sequential.visited_urls)
+        self.assertEqual(len(concurrent.meta), 11)
+        self.assertGreater(session.max_in_flight["total"], 1)
+
+    def test_same_depth_as_sequential(self):
+        # /d is linked from depth 1 and depth 2, it has to be cloned at depth 2 so /f is left out
+        sequential, _, _ = self.clone(max_depth=2, workers=1)
+        concurrent, _, _ = self.clone(max_depth=2, workers=4)
+        self.assertEqual(concurrent.meta, sequential.meta)
+        self.assertIn("/d", concurrent.meta)
+        self.assertNotIn("/f", concurrent.meta)
+
+    def test_parse_pool(self):
+        in_loop, _, in_loop_files = self.clone(workers=4)
+        pooled, _, pooled_files = self.clone(workers=4, parse_workers=2)
+        self.assertEqual(pooled.meta, in_loop.meta)
+        self.assertEqual(pooled_files, in_loop_files)
+        self.assertEqual(pooled.visited_urls, in_loop.visited_urls)
+        self.assertIsNone(pooled.parse_pool)
+
+    def test_parse_pool_shutdown(self):
+        ProcessPool.shutdowns = []
+        with patch("snare.cloner.ProcessPoolExecutor", ProcessPool):
+            pooled, _, _ = self.clone(workers=4, parse_workers=2)
+        self.assertEqual(len(pooled.meta), 11)
+        self.assertEqual(ProcessPool.shutdowns, [True])
+        self.assertEqual(pooled.parse_futures, set())
+
+    def test_parse_pool_error(self):
+        cloner = Cloner("http://example.com", 10, "false", default_path=self.main_page_path, parse_workers=1)
+        session = FakeSession()
+        # relative links can't be resolved, so parsing the pages fails in the pool
+        cloner.root = None
+
+        async def test():
+            for path in SITE:
+                await cloner.new_urls.put((yarl.URL("http://example.com" + path), 0))
+            await cloner.get_body(session)
+
+        ProcessPool.shutdowns = []
+        with patch("snare.cloner.ProcessPoolExecutor", ProcessPool):
+            with self.assertRaises(AttributeError):
+                self.loop.run_until_complete(test())
+        self.assertEqual(ProcessPool.shutdowns, [True])
+        self.assertIsNone(cloner.parse_pool)
+        self.assertEqual(cloner.parse_futures, set())
+
+    def test_parse_pool_depth(self):
+        in_loop, _, _ = self.clone(max_depth=2, workers=4)
+        pooled, _, _ = self.clone(max_depth=2, workers=4, parse_workers=2)
+        self.assertEqual(pooled.meta, in_loop.meta)
+
+    def test_max_per_host(self):
+        _, session, _ = self.clone(workers=8, max_per_host=2)
+        self.assertEqual(session.max_in_flight["example.com"], 2)
+        self.assertEqual(session.max_in_flight["cdn.example.org"], 2)
+        self.assertEqual(len(session.requests), len(set(session.requests)))
+
+    def test_worker_error(self):
+        cloner = Cloner("http://example.com", 10, "false", default_path=self.main_page_path, workers=2)
+        session = FakeSession()
+        cloner.replace_links = Mock(side_effect=ValueError("broken page"))
+
+        async def test():
+            await cloner.new_urls.put((cloner.root, 0))
+            await cloner.new_urls.put((yarl.URL("http://example.com/a"), 0))
+            await cloner.get_body(session)
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(test())
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
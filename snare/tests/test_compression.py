@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+import argparse
+import gzip
+import shutil
+import os
+from unittest.mock import patch
+from snare import compression
+from snare.compression import choose_encoding, compress, is_compressible
+from snare.tanner_handler import TannerHandler
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestCompression(unittest.TestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, deflate, br", ["br", "gzip"]), "br")
+        self.assertEqual(choose_encoding("gzip, deflate", ["br", "gzip"]), "gzip")
+        self.assertEqual(choose_encoding("br;q=0, gzip;q=0.5", ["br", "gzip"]), "gzip")
+        self.assertEqual(choose_encoding("*", ["gzip"]), "gzip")
+        self.assertEqual(choose_encoding("*, gzip;q=0", ["gzip"]), None)
+        self.assertEqual(choose_encoding("identity", ["br", "gzip"]), None)
+        self.assertEqual(choose_encoding("gzip;q=bad", ["gzip"]), None)
+
+    def test_is_compressible(self):
+        self.assertTrue(is_compressible("text/html; charset=UTF-8"))
+        self.assertTrue(is_compressible("application/javascript"))
+        self.assertFalse(is_compressible("image/png"))
+        self.assertFalse(is_compressible(None))
+
+    def test_gzip(self):
+        content = b"snare " * 100
+        self.assertEqual(gzip.decompress(compress(content, "gzip")), content)
+        self.assertEqual(compress(content, "gzip"), compress(memoryview(content), "gzip"))
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        content = b"snare " * 100
+        self.assertEqual(compression.brotli.decompress(compress(content, "br")), content)
+
+
+class TestGetEncodedPage(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/app.js": {"hash": "js_hash", "headers": [{"Content-Type": "application/javascript"}]},
+            "/small.css": {"hash": "css_hash", "headers": [{"Content-Type": "text/css"}]},
+            "/logo.png": {"hash": "png_hash", "headers": [{"Content-Type": "image/png"}]},
+        }
+        self.files = {
+            "index_hash": b"<html><body><p>" + b"word " * 100 + b"</p></body></html>",
+            "js_hash": b"var snare = 1;\n" * 100,
+            "css_hash": b"p {}",
+            "png_hash": b"\x89PNG" * 100,
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(self.main_page_path, name), "wb") as f:
+                f.write(content)
+        args = argparse.ArgumentParser().parse_args([])
+        args.full_page_path = self.main_page_path
+        args.no_dorks = True
+        args.tanner = "tanner.mushmush.org"
+        args.index_page = "/index.html"
+        args.compression = True
+        self.handler = TannerHandler(args, meta, "test_uuid")
+        self.loop = asyncio.new_event_loop()
+
+    def get(self, path, accept_encoding="gzip, deflate"):
+        with patch.object(compression, "brotli", None):
+            return self.loop.run_until_complete(self.handler.get_encoded_page(path, accept_encoding))
+
+    def test_compressed_variant(self):
+        content, headers = self.get("/app.js")
+        self.assertEqual(gzip.decompress(content), self.files["js_hash"])
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["Content-Type"], "application/javascript")
+        self.assertIs(self.get("/app.js")[0], content)
+
+    def test_html_without_dorks(self):
+        content, _ = self.get("/")
+        self.assertEqual(gzip.decompress(content), self.files["index_hash"])
+
+    def test_html_with_dorks(self):
+        self.handler.html_handler.no_dorks = False
+        self.assertIsNone(self.get("/"))
+
+    def test_not_compressed(self):
+        self.assertIsNone(self.get("/logo.png"))
+        self.assertIsNone(self.get("/small.css"))
+        self.assertIn("css_hash", self.handler.pages.small_pages)
+        self.assertIsNone(self.get("/missing.js"))
+        self.assertIsNone(self.get("/app.js", accept_encoding="identity"))
+        self.assertIsNone(self.get("/app.js", accept_encoding=None))
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
@@ -0,0 +1,104 @@
+import unittest
+import asyncio
+from snare.dork_pool import DorkPool
+from snare.utils.asyncmock import AsyncMock
+
+
+class TestDorkPool(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.fetch = AsyncMock(return_value=["/c", "/b", "/a"])
+
+    def test_wait_for_first_fetch(self):
+        pool = DorkPool(self.fetch, low_watermark=0)
+
+        async def test():
+            return [await pool.pop() for _ in range(3)]
+
+        self.assertEqual(self.loop.run_until_complete(test()), ["/a", "/b", "/c"])
+        self.assertEqual(pool.counters, dict(served=3, recycled=0, fetches=1, fetch_errors=0))
+
+    def test_prefetch_below_watermark(self):
+        pool = DorkPool(self.fetch, low_watermark=2)
+        pool.dorks = ["/y", "/x"]
+
+        async def test():
+            first = await pool.pop()
+            await asyncio.sleep(0)
+            return first
+
+        self.assertEqual(self.loop.run_until_complete(test()), "/x")
+        self.assertEqual(pool.dorks, ["/c", "/b", "/a", "/y"])
+        self.assertEqual(pool.depth, 4)
+
+    def test_coalesce_refills(self):
+        pool = DorkPool(self.fetch, low_watermark=0)
+
+        async def test():
+            return await asyncio.gather(*[pool.pop() for _ in range(3)])
+
+        self.assertCountEqual(self.loop.run_until_complete(test()), ["/a", "/b", "/c"])
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_more_waiters_than_fetched(self):
+        pool = DorkPool(self.fetch, low_watermark=0)
+
+        async def test():
+            return await asyncio.gather(*[pool.pop() for _ in range(5)])
+
+        dorks = self.loop.run_until_complete(test())
+        self.assertCountEqual(set(dorks), ["/a", "/b", "/c"])
+        self.assertEqual(pool.counters["recycled"], 2)
+
+    def test_recycle_while_refilling(self):
+        pool = DorkPool(self.fetch, low_watermark=0)
+        pool.dorks = ["/x"]
+
+        async def test():
+            return [await pool.pop() for _ in range(3)]
+
+        self.assertEqual(self.loop.run_until_complete(test()), ["/x", "/x", "/x"])
+        self.assertEqual(pool.counters["recycled"], 2)
+        self.loop.run_until_complete(pool.refill_task)
+        self.assertEqual(pool.depth, 3)
+
+    def test_fetch_error(self):
+        self.fetch = AsyncMock(side_effect=Exception("tanner down"))
+        pool = DorkPool(self.fetch)
+
+        with self.assertLogs(level="ERROR") as log:
+            with self.assertRaises(IndexError):
+                self.loop.run_until_complete(pool.pop())
+            self.assertIn("Error refilling the dork pool: tanner down", log.output[0])
+        self.assertEqual(pool.counters["fetch_errors"], 1)
+
+    def test_retry_delay(self):
+        self.fetch = AsyncMock(side_effect=Exception("tanner down"))
+        pool = DorkPool(self.fetch, retry_delay=60)
+
+        with self.assertLogs(level="ERROR"):
+            for _ in range(3):
+                with self.assertRaises(IndexError):
+                    self.loop.run_until_complete(pool.pop())
+        self.assertEqual(self.fetch.call_count, 1)
+
+        pool.retry_at = 0
+        self.fetch.side_effect = None
+        self.fetch.return_value = ["/a"]
+        self.assertEqual(self.loop.run_until_complete(pool.pop()), "/a")
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_empty_fetch(self):
+        self.fetch = AsyncMock(return_value=[])
+        pool = DorkPool(self.fetch, retry_delay=60)
+
+        with self.assertLogs(level="WARNING") as log:
+            for _ in range(3):
+                with self.assertRaises(IndexError):
+                    self.loop.run_until_complete(pool.pop())
+        self.assertIn("Tanner returned no dorks", log.output[0])
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(pool.counters["fetch_errors"], 0)
+
+    def tearDown(self):
+        self.loop.close()
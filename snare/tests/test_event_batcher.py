@@ -0,0 +1,133 @@
+import unittest
+import asyncio
+import argparse
+import shutil
+import os
+import aiohttp
+from unittest.mock import Mock
+from snare.event_batcher import EventBatcher
+from snare.tanner_handler import TannerHandler
+from snare.utils.asyncmock import AsyncMock
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.tanner_stub import TannerStub
+
+
+class TestEventBatcher(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.submit_batch = AsyncMock(side_effect=lambda events: [{"path": data["path"]} for data in events])
+
+    def test_flush_on_size(self):
+        batcher = EventBatcher(self.submit_batch, max_size=3, max_linger=10)
+
+        async def test():
+            return await asyncio.gather(*[batcher.submit({"path": "/{}".format(idx)}) for idx in range(3)])
+
+        results = self.loop.run_until_complete(asyncio.wait_for(test(), 1))
+        self.submit_batch.assert_called_once_with([{"path": "/0"}, {"path": "/1"}, {"path": "/2"}])
+        self.assertEqual(results, [{"path": "/0"}, {"path": "/1"}, {"path": "/2"}])
+
+    def test_flush_on_linger(self):
+        batcher = EventBatcher(self.submit_batch, max_size=50, max_linger=0.01)
+
+        async def test():
+            return await asyncio.gather(batcher.submit({"path": "/a"}), batcher.submit({"path": "/b"}))
+
+        results = self.loop.run_until_complete(asyncio.wait_for(test(), 1))
+        self.submit_batch.assert_called_once_with([{"path": "/a"}, {"path": "/b"}])
+        self.assertEqual(results, [{"path": "/a"}, {"path": "/b"}])
+
+    def test_flush_error(self):
+        self.submit_batch = AsyncMock(side_effect=aiohttp.ClientError("tanner down"))
+        batcher = EventBatcher(self.submit_batch, max_size=2, max_linger=10)
+
+        async def test():
+            return await asyncio.gather(
+                batcher.submit({"path": "/a"}), batcher.submit({"path": "/b"}), return_exceptions=True
+            )
+
+        results = self.loop.run_until_complete(asyncio.wait_for(test(), 1))
+        self.assertTrue(all(isinstance(result, aiohttp.ClientError) for result in results))
+
+    def test_stop_flushes_pending(self):
+        batcher = EventBatcher(self.submit_batch, max_size=50, max_linger=10)
+
+        async def test():
+            pending = asyncio.ensure_future(batcher.submit({"path": "/a"}))
+            await asyncio.sleep(0)
+            await batcher.stop()
+            return await pending
+
+        result = self.loop.run_until_complete(asyncio.wait_for(test(), 1))
+        self.assertEqual(result, {"path": "/a"})
+
+    def tearDown(self):
+        self.loop.close()
+
+
+class TestEventBatcherStub(unittest.TestCase):
+    def setUp(self):
+        run_args = argparse.ArgumentParser()
+        run_args.add_argument("--tanner")
+        run_args.add_argument("--page-dir")
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        page_dir = self.main_page_path.rsplit("/")[-1]
+        args = run_args.parse_args(["--page-dir", page_dir])
+        args_dict = vars(args)
+        args_dict["full_page_path"] = self.main_page_path
+        args.tanner = "127.0.0.1"
+        args.no_dorks = True
+        self.stub = TannerStub()
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.stub.start("127.0.0.1", 0))
+        args.tanner_port = self.stub.port
+        self.handler = TannerHandler(args, {}, "test_uuid")
+
+    def test_session_uuid_correlation(self):
+        batcher = EventBatcher(self.handler.submit_batch, max_size=3, max_linger=10)
+        events = [dict(uuid="test_uuid", path="/{}".format(idx), cookies=dict(sess_uuid=str(idx))) for idx in range(3)]
+
+        async def test():
+            return await asyncio.gather(*[batcher.submit(data) for data in events])
+
+        results = self.loop.run_until_complete(asyncio.wait_for(test(), 5))
+        self.assertEqual([result["response"]["message"]["sess_uuid"] for result in results], ["0", "1", "2"])
+        self.assertEqual(self.stub.events, events)
+
+    def test_missing_batch_results(self):
+        response = Mock()
+        response.json = AsyncMock(return_value={"version": "0.6.0", "response": {"messages": []}})
+        response.release = AsyncMock()
+        self.handler.get_session = Mock(return_value=Mock(post=AsyncMock(return_value=response)))
+
+        async def test():
+            return await self.handler.submit_batch([dict(uuid="test_uuid", path="/")])
+
+        results = self.loop.run_until_complete(test())
+        self.assertEqual(results, [TannerHandler.default_event_result(dict(uuid="test_uuid"))])
+
+    def test_batch_endpoint_missing(self):
+        response = Mock(status=404)
+        response.release = AsyncMock()
+        session = Mock(post=AsyncMock(return_value=response))
+        self.handler.get_session = Mock(return_value=session)
+        self.handler.submit_data = AsyncMock(side_effect=lambda data: {"path": data["path"]})
+        events = [dict(uuid="test_uuid", path="/a"), dict(uuid="test_uuid", path="/b")]
+
+        async def test():
+            return [await self.handler.submit_batch(events), await self.handler.submit_batch(events[:1])]
+
+        results = self.loop.run_until_complete(test())
+        self.assertEqual(results, [[{"path": "/a"}, {"path": "/b"}], [{"path": "/a"}]])
+        # tanner is asked for the batch endpoint only once
+        session.post.assert_called_once()
+        self.assertEqual(self.handler.submit_data.call_count, 3)
+        self.assertFalse(self.handler.batch_supported)
+        self.assertEqual(self.handler.counters["fallbacks"], 0)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.handler.close_session())
+        self.loop.run_until_complete(self.stub.stop())
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
@@ -0,0 +1,69 @@
+import unittest
+import asyncio
+from snare.event_queue import EventQueue
+from snare.utils.asyncmock import AsyncMock
+
+
+class TestEventQueue(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.submit = AsyncMock()
+
+    def test_deliver_events(self):
+        event_queue = EventQueue(self.submit, maxsize=10, workers=2)
+
+        async def test():
+            await event_queue.start()
+            for idx in range(5):
+                await event_queue.put({"path": "/{}".format(idx)})
+            await event_queue.stop()
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(self.submit.call_count, 5)
+        self.assertEqual(event_queue.counters, dict(queued=5, sent=5, dropped=0, failed=0))
+
+    def test_drop_oldest(self):
+        event_queue = EventQueue(self.submit, maxsize=2, workers=0)
+
+        async def test():
+            await event_queue.start()
+            for idx in range(3):
+                await event_queue.put({"path": "/{}".format(idx)})
+            self.assertEqual(event_queue.queue.get_nowait(), {"path": "/1"})
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(event_queue.counters["dropped"], 1)
+        self.assertEqual(event_queue.counters["queued"], 3)
+
+    def test_block(self):
+        event_queue = EventQueue(self.submit, maxsize=1, workers=0, overflow="block")
+
+        async def test():
+            await event_queue.start()
+            await event_queue.put({"path": "/0"})
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(event_queue.put({"path": "/1"}), 0.05)
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(event_queue.counters["dropped"], 0)
+
+    def test_failed_delivery(self):
+        self.submit = AsyncMock(side_effect=Exception("tanner down"))
+        event_queue = EventQueue(self.submit, maxsize=10, workers=1)
+
+        async def test():
+            await event_queue.start()
+            await event_queue.put({"path": "/"})
+            await event_queue.stop()
+
+        with self.assertLogs(level="ERROR") as log:
+            self.loop.run_until_complete(test())
+            self.assertIn("Error delivering queued event: tanner down", log.output[0])
+        self.assertEqual(event_queue.counters["failed"], 1)
+
+    def test_unknown_overflow(self):
+        with self.assertRaises(ValueError):
+            EventQueue(self.submit, overflow="ignore")
+
+    def tearDown(self):
+        self.loop.close()
@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+from unittest.mock import Mock
+import cssutils
+from bs4 import BeautifulSoup
+from snare.html_handler import HtmlHandler
+from snare.utils.asyncmock import AsyncMock
+
+
+def render_reference(content, dorks):
+    # Dork injection as it was done before pages were compiled, kept as the expected output
+    soup = BeautifulSoup(content, "html.parser")
+    for p_elem in soup.find_all("p"):
+        if p_elem.findChildren():
+            continue
+        css = None
+        if "style" in p_elem.attrs:
+            css = cssutils.parseStyle(p_elem.attrs["style"])
+        text_list = p_elem.text.split()
+        p_new = soup.new_tag("p", style=css.cssText if css else None)
+        for idx, word in enumerate(text_list):
+            word += " "
+            if idx % 5 == 0:
+                a_tag = soup.new_tag(
+                    "a",
+                    href=dorks.pop(),
+                    style="color:{color};text-decoration:none;cursor:text;".format(
+                        color=css.color if css and "color" in css.keys() else "#000000"
+                    ),
+                )
+                a_tag.string = word
+                p_new.append(a_tag)
+            else:
+                p_new.append(soup.new_string(word))
+        p_elem.replace_with(p_new)
+    return soup.encode("utf-8")
+
+
+class TestCompileTemplate(unittest.TestCase):
+    def setUp(self):
+        self.pages = [
+            b"<html><body><p>one two three four five six seven eight nine ten eleven</p></body></html>",
+            b'<html><head><meta charset="utf-8"/></head><body><p style="color: red; font-size: 2px">'
+            b"caf\xc3\xa9 &amp; cr&egrave;me</p><p>kept <b>bold</b></p><P>upper case</P></body></html>",
+            b"<!DOCTYPE html><html><body><div><p>a</p><p></p><p>  spaced\n words  </p></div></body></html>",
+            b"<html><body>no paragraphs &lt;here&gt;</body></html>",
+        ]
+        self.dorks = ["/plain", "/q?a=1&b=2", '/say "hi"', '/it\'s "both"', "/<tag>"] * 5
+        self.handler = HtmlHandler(False, "tanner.mushmush.org", dorks_low_watermark=0)
+        self.loop = asyncio.new_event_loop()
+
+    def test_same_output_as_reference(self):
+        for page in self.pages:
+            self.handler.dork_pool.dorks = list(self.dorks)
+            expected = render_reference(page, list(self.dorks))
+            content = self.loop.run_until_complete(self.handler.handle_content(page))
+            self.assertEqual(content, expected)
+
+    def test_same_output_without_dorks(self):
+        self.handler.no_dorks = True
+        for page in self.pages:
+            content = self.loop.run_until_complete(self.handler.handle_content(page))
+            self.assertEqual(content, BeautifulSoup(page, "html.parser").encode("utf-8"))
+
+    def test_compiled_once(self):
+        self.handler.compile_template = Mock(wraps=self.handler.compile_template)
+        self.handler.dork_pool.dorks = list(self.dorks)
+        for _ in range(3):
+            self.loop.run_until_complete(self.handler.handle_content(self.pages[0], key="page_hash"))
+        self.handler.compile_template.assert_called_once_with(self.pages[0])
+        self.assertEqual(len(self.handler.dork_pool.dorks), len(self.dorks) - 9)
+
+    def test_refill_dorks(self):
+        self.handler.get_dorks = AsyncMock(return_value=["/third", "/second", "/first"])
+        content = self.loop.run_until_complete(self.handler.handle_content(self.pages[0]))
+        self.assertEqual(content, render_reference(self.pages[0], ["/third", "/second", "/first"]))
+        self.handler.get_dorks.assert_called_once_with()
+
+    def test_no_dorks_available(self):
+        self.handler.get_dorks = AsyncMock(return_value=[])
+        for _ in range(2):
+            with self.assertRaises(IndexError):
+                self.loop.run_until_complete(self.handler.handle_content(self.pages[0]))
+        self.handler.get_dorks.assert_called_once_with()
+
+    def tearDown(self):
+        self.loop.close()
@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 import asyncio
 import shutil
 import os
@@ -16,26 +17,33 @@ class TestGetDorks(unittest.TestCase):
         os.makedirs(self.main_page_path)
         self.dorks = dict(response={"dorks": "test_dorks"})
         self.loop = asyncio.new_event_loop()
-        aiohttp.ClientSession.get = AsyncMock(
-            return_value=aiohttp.ClientResponse(
-                url=yarl.URL("http://www.example.com"),
-                method="GET",
-                writer=None,
-                continue100=1,
-                timer=None,
-                request_info=None,
-                traces=None,
-                loop=self.loop,
-                session=None,
-            )
-        )
+        self.addCleanup(patch.stopall)
+        patch.object(
+            aiohttp.ClientSession,
+            "get",
+            AsyncMock(
+                return_value=aiohttp.ClientResponse(
+                    url=yarl.URL("http://www.example.com"),
+                    method="GET",
+                    writer=None,
+                    continue100=1,
+                    timer=None,
+                    request_info=None,
+                    traces=None,
+                    loop=self.loop,
+                    session=None,
+                )
+            ),
+        ).start()
         no_dorks = True
         tanner = "tanner.mushmush.org"
         self.handler = HtmlHandler(no_dorks, tanner)
         self.data = None
 
     def test_get_dorks(self):
-        aiohttp.ClientResponse.json = AsyncMock(return_value=dict(response={"dorks": "test_dorks"}))
+        patch.object(
+            aiohttp.ClientResponse, "json", AsyncMock(return_value=dict(response={"dorks": "test_dorks"}))
+        ).start()
 
         async def test():
             self.data = await self.handler.get_dorks()
@@ -44,7 +52,7 @@ class TestGetDorks(unittest.TestCase):
         aiohttp.ClientSession.get.assert_called_with("http://tanner.mushmush.org:8090/dorks", timeout=10.0)
 
     def test_return_dorks(self):
-        aiohttp.ClientResponse.json = AsyncMock(return_value=self.dorks)
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(return_value=self.dorks)).start()
 
         async def test():
             self.data = await self.handler.get_dorks()
@@ -53,7 +61,7 @@ class TestGetDorks(unittest.TestCase):
         self.assertEqual(self.data, self.dorks["response"]["dorks"])
 
     def test_logging_error(self):
-        aiohttp.ClientResponse.json = AsyncMock(side_effect=JSONDecodeError("ERROR", "", 0))
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(side_effect=JSONDecodeError("ERROR", "", 0))).start()
 
         async def test():
             self.data = await self.handler.get_dorks()
@@ -63,7 +71,7 @@ class TestGetDorks(unittest.TestCase):
             self.assertIn("Error getting dorks: ERROR: line 1 column 1 (char 0)", log.output[0])
 
     def test_logging_timeout(self):
-        aiohttp.ClientResponse.json = AsyncMock(side_effect=asyncio.TimeoutError())
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(side_effect=asyncio.TimeoutError())).start()
 
         async def test():
             self.data = await self.handler.get_dorks()
@@ -73,7 +81,7 @@ class TestGetDorks(unittest.TestCase):
             self.assertIn("Dorks timeout", log.output[0])
 
     def test_return_dorks_exception(self):
-        aiohttp.ClientResponse.json = AsyncMock(side_effect=Exception())
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(side_effect=Exception())).start()
 
         async def test():
             self.data = await self.handler.get_dorks()
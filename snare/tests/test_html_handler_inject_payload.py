@@ -0,0 +1,52 @@
+import unittest
+from bs4 import BeautifulSoup
+from snare.html_handler import HtmlHandler
+
+
+def inject_reference(content, payload):
+    # Payload injection as it was done before the payload offset was precomputed, kept as the expected output
+    content = content.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    soup = BeautifulSoup(content, "html.parser")
+    script_tag = soup.new_tag("div")
+    script_tag.append(BeautifulSoup(payload, "html.parser"))
+    soup.body.append(script_tag)
+    return str(soup).encode()
+
+
+class TestInjectPayload(unittest.TestCase):
+    def setUp(self):
+        self.pages = [
+            b"<html><body></body></html>",
+            b"<!DOCTYPE html>\r\n<html><head><title>t</title></head>\r\n<body>\r\n<p>caf\xc3\xa9 &amp; more</p>\r\n"
+            b"<script>var s = '</body>';</script>\r\n</body>\r\n</html>\r\n",
+            b"<html><body><div><p>unclosed<div>nested</body><footer>after</footer></html>",
+            b"<body>only body</body><!-- </body> -->",
+        ]
+        self.payloads = [
+            "test",
+            "<script>alert(1)</script>",
+            "<img src=x onerror=alert('x')>",
+            "<b>unclosed <i>tags",
+            "../../etc/passwd &amp; <br> 'quotes' \"double\"",
+            "",
+        ]
+        self.handler = HtmlHandler(True, "tanner.mushmush.org")
+
+    def test_same_output_as_reference(self):
+        for idx, page in enumerate(self.pages):
+            for payload in self.payloads:
+                content = self.handler.inject_payload(page, payload, key="page_{}".format(idx))
+                self.assertEqual(content, inject_reference(page, payload))
+
+    def test_compiled_once(self):
+        self.handler.inject_payload(self.pages[1], "first", key="page_hash")
+        template = self.handler.payload_templates["page_hash"]
+        self.handler.inject_payload(self.pages[1], "second", key="page_hash")
+        self.assertIs(self.handler.payload_templates["page_hash"], template)
+
+    def test_page_without_body(self):
+        page = b"<html><head></head></html>"
+        with self.assertRaises(AttributeError):
+            inject_reference(page, "test")
+        with self.assertRaises(AttributeError):
+            self.handler.inject_payload(page, "test", key="no_body")
@@ -0,0 +1,48 @@
+import unittest
+import shutil
+import os
+from snare.benchmarks import load
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestLoadBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.page_path = generate_unique_path()
+        os.makedirs(self.page_path)
+        self.results = dict(
+            workloads=dict(static=dict(rps=100.0, latency_ms=dict(p99=10.0), errors=0)),
+        )
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(load.percentile(values, 0.5), 50)
+        self.assertEqual(load.percentile(values, 0.99), 99)
+        self.assertEqual(load.percentile([7], 0.99), 7)
+        self.assertIsNone(load.percentile([], 0.5))
+
+    def test_compare_within_tolerance(self):
+        baseline = dict(workloads=dict(static=dict(rps=110.0, latency_ms=dict(p99=9.0), errors=0)))
+        self.assertEqual(load.compare(self.results, baseline, 0.2), [])
+
+    def test_compare_regressions(self):
+        baseline = dict(workloads=dict(static=dict(rps=200.0, latency_ms=dict(p99=5.0), errors=0)))
+        self.results["workloads"]["static"]["errors"] = 3
+        regressions = load.compare(self.results, baseline, 0.2)
+        self.assertEqual(len(regressions), 3)
+        self.assertIn("static: 100.0 req/s, baseline 200.0 req/s", regressions)
+
+    def test_compare_new_workload(self):
+        self.assertEqual(load.compare(self.results, dict(workloads={}), 0.2), [])
+
+    def test_run_static_workload(self):
+        meta = load.create_site(self.page_path, page_size=4 * 1024)
+        workload = load.WORKLOADS[0]
+        result = load.run_workload(workload, self.page_path, meta, concurrency=4, duration=30, requests=30, warmup=0)
+        self.assertEqual(result["requests"], 30)
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["statuses"], {"200": 30})
+        self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["p99"])
+        self.assertGreater(result["rps"], 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.page_path)
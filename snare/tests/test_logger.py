@@ -1,7 +1,11 @@
 import unittest
-from snare.utils.logger import Logger, LevelFilter
+from snare.utils.logger import Logger, LevelFilter, DroppingQueueHandler, RotatingLogHandler
+from snare.utils.page_path_generator import generate_unique_path
+import gzip
 import logging
 import os
+import shutil
+import time
 
 
 class TestLogger(unittest.TestCase):
@@ -21,10 +25,158 @@ class TestLogger(unittest.TestCase):
     def test_filter(self):
         self.assertTrue(LevelFilter(logging.ERROR).filter(logging.makeLogRecord(self.record_dict)))
 
+    def test_written_by_listener(self):
+        self.logger.info("Request path: /index.html")
+        self.logger.error("Error submitting data")
+        Logger.stop()
+        with open(self.snare_log_file) as fh:
+            debug_log = fh.read()
+        with open(self.snare_err_log_file) as fh:
+            err_log = fh.read()
+        self.assertIn("Request path: /index.html", debug_log)
+        self.assertNotIn("Error submitting data", debug_log)
+        self.assertIn("Error submitting data", err_log)
+
+    def tearDown(self):
+        Logger.stop()
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+        for log_file in (
+            self.cloner_log_file,
+            self.snare_log_file,
+            self.snare_err_log_file,
+            self.snare_log_file + ".lock",
+            self.snare_err_log_file + ".lock",
+        ):
+            try:
+                os.remove(log_file)
+            except FileNotFoundError:
+                pass
+
+
+class TestRotatingLogHandler(unittest.TestCase):
+    def setUp(self):
+        self.log_path = generate_unique_path()
+        os.makedirs(self.log_path)
+        self.log_file = os.path.join(self.log_path, "snare.log")
+        self.handlers = []
+
+    def create_handler(self, **kwargs):
+        handler = RotatingLogHandler(self.log_file, **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.handlers.append(handler)
+        return handler
+
+    def emit(self, handler, message):
+        handler.handle(logging.makeLogRecord({"msg": message, "levelno": logging.INFO}))
+
+    def expire_interval(self, handler):
+        # the last rotation of any process is the mtime of the lock file
+        rotated = time.time() - handler.interval - 1
+        os.utime(handler.lock_path, (rotated, rotated))
+        handler.rollover_at = rotated + handler.interval
+
+    def read_backup(self, idx):
+        with gzip.open("{}.{}.gz".format(self.log_file, idx), "rt") as fh:
+            return fh.read()
+
+    def test_rotate_by_size(self):
+        handler = self.create_handler(max_bytes=100, backup_count=2)
+        for idx in range(4):
+            self.emit(handler, "{} {}".format(idx, "x" * 60))
+        handler.close()
+        self.assertEqual(
+            sorted(os.listdir(self.log_path)), ["snare.log", "snare.log.1.gz", "snare.log.2.gz", "snare.log.lock"]
+        )
+        self.assertTrue(self.read_backup(1).startswith("2 "))
+        self.assertTrue(self.read_backup(2).startswith("1 "))
+        with open(self.log_file) as fh:
+            self.assertTrue(fh.read().startswith("3 "))
+
+    def test_rotate_without_backups(self):
+        handler = self.create_handler(max_bytes=200, backup_count=0)
+        for idx in range(100):
+            self.emit(handler, "{:02} {}".format(idx, "x" * 46))
+        handler.close()
+        self.assertEqual(sorted(os.listdir(self.log_path)), ["snare.log", "snare.log.lock"])
+        self.assertLess(os.path.getsize(self.log_file), 200)
+        with open(self.log_file) as fh:
+            self.assertTrue(fh.read().startswith("99 "))
+
+    def test_rotate_by_interval(self):
+        handler = self.create_handler(interval=60)
+        self.emit(handler, "first")
+        self.expire_interval(handler)
+        self.emit(handler, "second")
+        handler.close()
+        self.assertEqual(self.read_backup(1), "first\n")
+        with open(self.log_file) as fh:
+            self.assertEqual(fh.read(), "second\n")
+
+    def test_skip_empty_interval(self):
+        handler = self.create_handler(interval=60)
+        self.expire_interval(handler)
+        self.emit(handler, "first")
+        handler.close()
+        self.assertEqual(sorted(os.listdir(self.log_path)), ["snare.log", "snare.log.lock"])
+        self.assertGreater(handler.rollover_at, time.time())
+
+    def test_reopen_rotated_by_other_process(self):
+        handler = self.create_handler(max_bytes=1000)
+        other = self.create_handler(max_bytes=1000)
+        self.emit(handler, "first")
+        os.rename(self.log_file, self.log_file + ".moved")
+        self.emit(other, "second")
+        handler.close()
+        other.close()
+        with open(self.log_file) as fh:
+            self.assertEqual(fh.read(), "second\n")
+
+    def test_rotate_once_per_interval(self):
+        # forked workers share the file and its rollover time
+        workers = [self.create_handler(interval=60, backup_count=5) for _ in range(4)]
+        self.emit(workers[0], "previous period")
+        self.expire_interval(workers[0])
+        for idx, worker in enumerate(workers):
+            worker.rollover_at = workers[0].rollover_at
+            self.emit(worker, "worker {}".format(idx))
+        for worker in workers:
+            worker.close()
+        self.assertEqual(sorted(os.listdir(self.log_path)), ["snare.log", "snare.log.1.gz", "snare.log.lock"])
+        self.assertEqual(self.read_backup(1), "previous period\n")
+        with open(self.log_file) as fh:
+            self.assertEqual(fh.read(), "worker 0\nworker 1\nworker 2\nworker 3\n")
+
+    def test_rotate_once_per_size(self):
+        workers = [self.create_handler(max_bytes=100, backup_count=5) for _ in range(3)]
+        self.emit(workers[0], "x" * 90)
+        for idx, worker in enumerate(workers):
+            self.emit(worker, "worker {}".format(idx))
+        for worker in workers:
+            worker.close()
+        self.assertEqual(self.read_backup(1), "x" * 90 + "\n")
+        with open(self.log_file) as fh:
+            self.assertEqual(fh.read(), "worker 0\nworker 1\nworker 2\n")
+
     def tearDown(self):
-        try:
-            os.remove(self.cloner_log_file)
-            os.remove(self.snare_log_file)
-            os.remove(self.snare_err_log_file)
-        except FileNotFoundError:
-            pass
+        for handler in self.handlers:
+            handler.close()
+        shutil.rmtree(self.log_path)
+
+
+class TestDroppingQueueHandler(unittest.TestCase):
+    def test_drop_when_full(self):
+        handler = DroppingQueueHandler([logging.NullHandler()], queue_size=2)
+        for _ in range(5):
+            handler.handle(logging.makeLogRecord({"msg": "request", "levelno": logging.INFO}))
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(handler.queue.qsize(), 2)
+
+    def test_restart(self):
+        handler = DroppingQueueHandler([logging.NullHandler()], queue_size=2)
+        handler.handle(logging.makeLogRecord({"msg": "request", "levelno": logging.INFO}))
+        old_queue = handler.queue
+        handler.restart()
+        self.assertIsNot(handler.queue, old_queue)
+        self.assertIs(handler.listener.queue, handler.queue)
+        handler.listener.stop()
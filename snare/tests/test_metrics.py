@@ -0,0 +1,69 @@
+import unittest
+import shutil
+import socket
+import os
+from snare.metrics import Histogram, Metrics
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.server_fixture import ServerFixture
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def test_render(self):
+        metrics = Metrics()
+        metrics.stages["total"] = Histogram(buckets=(0.1, 1.0))
+        metrics.stages["total"].observe(0.5)
+        metrics.detections[2] += 3
+        metrics.add_collector(lambda: [("snare_test_depth", "gauge", "Test depth", [({}, 7)])])
+        text = metrics.render()
+        self.assertIn('snare_stage_duration_seconds_bucket{stage="total",le="0.1"} 0\n', text)
+        self.assertIn('snare_stage_duration_seconds_bucket{stage="total",le="1.0"} 1\n', text)
+        self.assertIn('snare_stage_duration_seconds_bucket{stage="total",le="+Inf"} 1\n', text)
+        self.assertIn('snare_stage_duration_seconds_count{stage="total"} 1\n', text)
+        self.assertIn('snare_detections_total{type="2"} 3\n', text)
+        self.assertIn("# TYPE snare_test_depth gauge\nsnare_test_depth 7\n", text)
+
+
+class TestServerMetrics(ServerFixture, unittest.TestCase):
+    def setUp(self):
+        meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/plain"}]},
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": "text/html"}]},
+        }
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        with open(os.path.join(self.main_page_path, "index_hash"), "wb") as f:
+            f.write(b"index")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.metrics_port = sock.getsockname()[1]
+        self.start_server(meta, metrics_port=self.metrics_port)
+
+    def test_metrics_listener(self):
+        for _ in range(3):
+            self.fetch("/index.html")
+        status, headers, body = self.fetch("/metrics", port=self.metrics_port)
+        text = body.decode("utf-8")
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        for stage in ("create_data", "submit_data", "parse_tanner_response", "total"):
+            self.assertIn('snare_stage_duration_seconds_count{{stage="{}"}} 3\n'.format(stage), text)
+        self.assertIn('snare_stage_duration_seconds_count{stage="post_read"} 0\n', text)
+        self.assertIn('snare_detections_total{type="1"} 3\n', text)
+        self.assertIn("snare_page_cache_misses_total 1\n", text)
+        self.assertIn("snare_page_cache_hits_total 2\n", text)
+        self.assertIn("snare_tanner_errors_total 0\n", text)
+
+    def test_metrics_not_on_site(self):
+        status, _, body = self.fetch("/metrics")
+        self.assertNotIn(b"snare_stage_duration_seconds", body)
+
+    def tearDown(self):
+        shutil.rmtree(self.main_page_path)
@@ -0,0 +1,62 @@
+import unittest
+import json
+import shutil
+import os
+from unittest.mock import patch
+from snare.benchmarks import micro
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestMicroBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.history = os.path.join(self.main_page_path, "history.jsonl")
+
+    def test_create_page(self):
+        page = micro.create_page(16 * 1024)
+        self.assertGreaterEqual(len(page), 16 * 1024)
+        self.assertLess(len(page), 17 * 1024)
+        self.assertTrue(page.endswith(b"</body></html>"))
+
+    def test_compare(self):
+        previous = {"create_data": {"best_us": 10.0}, "removed": {"best_us": 1.0}}
+        results = {"create_data": {"best_us": 8.0}, "new": {"best_us": 1.0}}
+        self.assertEqual(micro.compare(results, previous), {"create_data": -0.2})
+
+    def test_history(self):
+        argv = [
+            "--benchmark",
+            "create_data",
+            "--benchmark",
+            "parse_tanner_response",
+            "--size",
+            "small",
+            "--scale",
+            "0.001",
+            "--repeat",
+            "1",
+            "--history",
+            self.history,
+        ]
+        with open(os.devnull, "w") as devnull, patch("sys.stdout", devnull), patch("sys.stderr", devnull):
+            micro.main(argv + ["--label", "first"])
+            micro.main(argv)
+        with open(self.history) as fh:
+            first, second = [json.loads(line) for line in fh]
+        self.assertEqual(first["label"], "first")
+        self.assertNotIn("changes", first)
+        self.assertEqual(
+            sorted(second["results"]),
+            [
+                "create_data",
+                "parse_tanner_response.type1[small]",
+                "parse_tanner_response.type2[small]",
+                "parse_tanner_response.type3",
+            ],
+        )
+        self.assertEqual(sorted(second["changes"]), sorted(second["results"]))
+        self.assertEqual(second["results"]["create_data"]["iterations"], 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.main_page_path)
@@ -1,4 +1,9 @@
 import unittest
+import asyncio
+import aiohttp_jinja2
+import jinja2
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
 from snare.middlewares import SnareMiddleware
 
 
@@ -12,3 +17,26 @@ class TestMiddleware(unittest.TestCase):
 
     def test_initialization(self):
         self.assertIsInstance(self.middleware, SnareMiddleware)
+
+    def test_error_404_headers(self):
+        app = web.Application()
+        aiohttp_jinja2.setup(app, loader=jinja2.DictLoader({"error_404.html": "not found"}))
+        error_middleware = self.middleware.create_error_middleware({404: self.middleware.handle_404})
+
+        async def handler(request):
+            return web.Response(status=404)
+
+        async def test(request):
+            return await error_middleware(request, handler)
+
+        loop = asyncio.new_event_loop()
+        response = loop.run_until_complete(test(make_mocked_request("GET", "/missing", app=app)))
+        self.assertEqual(response.headers["Content-Type"], "text/html; charset=UTF-8")
+        # pages reloaded since the start have their own 404 headers
+        request = make_mocked_request("GET", "/missing", app=app)
+        request["error_404_headers"] = [{"Content-Type": "text/plain"}]
+        response = loop.run_until_complete(test(request))
+        self.assertEqual(response.status, 404)
+        self.assertEqual(response.headers["Content-Type"], "text/plain")
+        self.assertEqual(response.headers["Server"], "nginx")
+        loop.close()
@@ -0,0 +1,85 @@
+import unittest
+import asyncio
+import shutil
+import os
+from snare.page_cache import CacheBudget, PageCache
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        for name, size in (("hash_a", 4), ("hash_b", 4), ("hash_c", 4), ("hash_big", 20)):
+            with open(os.path.join(self.main_page_path, name), "wb") as f:
+                f.write(b"x" * size)
+        self.cache = PageCache(self.main_page_path, 10)
+        self.loop = asyncio.new_event_loop()
+
+    def test_hit_and_miss(self):
+        async def test():
+            first = await self.cache.read("hash_a")
+            second = await self.cache.read("hash_a")
+            return first, second
+
+        first, second = self.loop.run_until_complete(test())
+        self.assertEqual(first, b"xxxx")
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.counters, dict(hits=1, misses=1, evictions=0))
+
+    def test_missing_file(self):
+        content = self.loop.run_until_complete(self.cache.read("missing"))
+        self.assertIsNone(content)
+        self.assertNotIn("missing", self.cache.entries)
+
+    def test_eviction(self):
+        async def test():
+            await self.cache.read("hash_a")
+            await self.cache.read("hash_b")
+            await self.cache.read("hash_a")
+            await self.cache.read("hash_c")
+
+        self.loop.run_until_complete(test())
+        self.assertEqual(list(self.cache.entries), ["hash_a", "hash_c"])
+        self.assertEqual(self.cache.size, 8)
+        self.assertEqual(self.cache.counters["evictions"], 1)
+
+    def test_too_big(self):
+        content = self.loop.run_until_complete(self.cache.read("hash_big"))
+        self.assertEqual(len(content), 20)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_shared_budget(self):
+        budget = CacheBudget(10)
+        other = PageCache(self.main_page_path, budget=budget)
+        self.cache = PageCache(self.main_page_path, budget=budget)
+
+        async def test():
+            await self.cache.read("hash_a")
+            await other.read("hash_b")
+            await self.cache.read("hash_a")
+            await other.read("hash_c")
+
+        self.loop.run_until_complete(test())
+        # the least recently used body of either cache makes room
+        self.assertEqual(list(self.cache.entries), ["hash_a"])
+        self.assertEqual(list(other.entries), ["hash_c"])
+        self.assertEqual(other.counters["evictions"], 1)
+        self.assertEqual(budget.size, 8)
+
+    def test_move_to_budget(self):
+        self.loop.run_until_complete(self.cache.read("hash_a"))
+        self.loop.run_until_complete(self.cache.read("hash_b"))
+        budget = CacheBudget(6)
+        self.cache.move_to(budget)
+        self.assertEqual(list(self.cache.entries), ["hash_b"])
+        self.assertEqual(budget.size, 4)
+
+    def test_warm_up(self):
+        self.cache.warm_up(["hash_big", "hash_a", "hash_b", "hash_c", "missing"])
+        self.assertEqual(list(self.cache.entries), ["hash_a", "hash_b"])
+        self.assertEqual(self.cache.counters["evictions"], 0)
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
@@ -0,0 +1,92 @@
+import unittest
+import os
+import shutil
+import multidict
+from snare.page_index import PageIndex, PageValidator, etag_matches
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestPageIndex(unittest.TestCase):
+    def setUp(self):
+        self.meta = {
+            "/index.html": {
+                "hash": "index_hash",
+                "headers": [{"Content-Type": "text/html"}, {"Set-Cookie": "a=1"}, {"Set-Cookie": "b=2"}],
+            },
+            "/a b.css": {"hash": "css_hash", "headers": [{"Content-Type": "text/plain"}], "content_type": "text/css"},
+            "/search?q=1": {"hash": "search_hash", "headers": []},
+        }
+        self.index = PageIndex(self.meta, "/index.html")
+
+    def test_record(self):
+        page = self.index.get("/index.html")
+        self.assertEqual(page.hash, "index_hash")
+        self.assertEqual(page.content_type, "text/html")
+        self.assertEqual(page.headers.getall("Set-Cookie"), ["a=1", "b=2"])
+        self.assertIsInstance(page.headers, multidict.CIMultiDictProxy)
+
+    def test_legacy_content_type(self):
+        page = self.index.get("/a b.css")
+        self.assertEqual(page.content_type, "text/css")
+        self.assertEqual(page.headers.getall("Content-Type"), ["text/css"])
+
+    def test_index_page(self):
+        self.assertIs(self.index.get("/"), self.index.pages["/index.html"])
+        self.assertIs(self.index.get("/?x=1"), self.index.pages["/index.html"])
+
+    def test_precomputed_paths(self):
+        self.assertIn("/index.html/", self.index.paths)
+        self.assertIn("/search?q=1", self.index.paths)
+        self.assertNotIn("/a%20b.css", self.index.paths)
+
+    def test_normalized_paths(self):
+        self.assertEqual(self.index.get("//index.html").hash, "index_hash")
+        self.assertEqual(self.index.get("/index.html?id=1").hash, "index_hash")
+        self.assertEqual(self.index.get("/a%20b.css").hash, "css_hash")
+        self.assertEqual(self.index.get("/search?q=1").hash, "search_hash")
+
+    def test_missing_path(self):
+        self.assertIsNone(self.index.get("/missing"))
+        self.assertIsNone(self.index.get("something/"))
+        self.assertIsNone(self.index.get("/search"))
+
+
+class TestPageValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = PageValidator.create("index_hash", 1500000000.5, 42)
+
+    def test_create(self):
+        self.assertEqual(self.validator.etag, '"index_hash-59682f00-2a"')
+        self.assertEqual(self.validator.last_modified, "Fri, 14 Jul 2017 02:40:00 GMT")
+
+    def test_etag_matches(self):
+        etag = self.validator.etag
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(etag, '"other", W/' + etag))
+        self.assertTrue(etag_matches(etag, etag[:-1] + '-gzip"'))
+        self.assertTrue(etag_matches(etag, "*"))
+        self.assertFalse(etag_matches(etag, '"other"'))
+
+    def test_not_modified(self):
+        self.assertTrue(self.validator.not_modified({"If-None-Match": self.validator.etag}))
+        self.assertTrue(self.validator.not_modified({"If-Modified-Since": self.validator.last_modified}))
+        self.assertFalse(self.validator.not_modified({"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}))
+        self.assertFalse(self.validator.not_modified({"If-Modified-Since": "yesterday"}))
+        self.assertFalse(self.validator.not_modified({}))
+
+    def test_if_none_match_precedence(self):
+        headers = {"If-None-Match": '"other"', "If-Modified-Since": self.validator.last_modified}
+        self.assertFalse(self.validator.not_modified(headers))
+
+    def test_load_validators(self):
+        path = generate_unique_path()
+        os.makedirs(path)
+        self.addCleanup(shutil.rmtree, path)
+        with open(os.path.join(path, "index_hash"), "wb") as f:
+            f.write(b"index")
+        os.utime(os.path.join(path, "index_hash"), (1500000000, 1500000000))
+        index = PageIndex({"/index.html": {"hash": "index_hash"}, "/gone.html": {"hash": "gone_hash"}}, "/index.html")
+        index.load_validators(path)
+        self.assertEqual(list(index.validators), ["index_hash"])
+        self.assertEqual(index.validators["index_hash"].etag, '"index_hash-59682f00-5"')
+        self.assertNotIn("gone_hash", index.validators)
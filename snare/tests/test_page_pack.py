@@ -0,0 +1,88 @@
+import unittest
+import asyncio
+import argparse
+import shutil
+import os
+from snare.tanner_handler import TannerHandler
+import time
+from snare.utils.page_pack import PACK_NAME, PagePack, create_page_pack, page_pack_outdated
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestPagePack(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/index.html?id=1": {"hash": "index_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/logo.png": {"hash": "logo_hash", "headers": [{"Content-Type": "image/png"}]},
+            "/missing.css": {"hash": "missing_hash", "headers": [{"Content-Type": "text/css"}]},
+        }
+        self.files = {"index_hash": b"<html><body></body></html>", "logo_hash": bytes(range(256))}
+        for name, content in self.files.items():
+            with open(os.path.join(self.main_page_path, name), "wb") as f:
+                f.write(content)
+        self.pack = PagePack(create_page_pack(self.main_page_path, self.meta))
+
+    def test_pack_content(self):
+        self.assertEqual(self.pack.meta, self.meta)
+        for name, content in self.files.items():
+            view = self.pack.get(name)
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(view, content)
+            view.release()
+        self.assertIsNone(self.pack.get("missing_hash"))
+        self.assertEqual(len(self.pack.files), 2)
+
+    def test_not_a_pack(self):
+        with self.assertRaises(ValueError):
+            PagePack(os.path.join(self.main_page_path, "index_hash"))
+
+    def test_truncated_pack(self):
+        pack_path = os.path.join(self.main_page_path, PACK_NAME)
+        with open(pack_path, "rb") as fh:
+            content = fh.read()
+        for length in (10, len(content) - 10):
+            truncated_path = os.path.join(self.main_page_path, "truncated.pack")
+            with open(truncated_path, "wb") as fh:
+                fh.write(content[:length])
+            with self.assertRaises(ValueError):
+                PagePack(truncated_path)
+
+    def test_close_with_bodies_in_use(self):
+        view = self.pack.get("index_hash")
+        self.pack.close()
+        self.assertEqual(view, self.files["index_hash"])
+        view.release()
+
+    def test_outdated(self):
+        self.assertFalse(page_pack_outdated(self.main_page_path, self.meta))
+        # cloned again after the pack was built
+        cloned = time.time() + 10
+        os.utime(os.path.join(self.main_page_path, "logo_hash"), (cloned, cloned))
+        self.assertTrue(page_pack_outdated(self.main_page_path, self.meta))
+        self.assertTrue(page_pack_outdated(self.main_page_path, self.meta, pack_name="other.pack"))
+
+    def test_serve_from_pack(self):
+        run_args = argparse.ArgumentParser().parse_args([])
+        run_args.full_page_path = self.main_page_path
+        run_args.no_dorks = True
+        run_args.tanner = "tanner.mushmush.org"
+        run_args.index_page = "/index.html"
+        handler = TannerHandler(run_args, self.pack.meta, "test_uuid", page_pack=self.pack)
+        os.remove(os.path.join(self.main_page_path, "logo_hash"))
+
+        content, headers, status_code = asyncio.new_event_loop().run_until_complete(
+            handler.parse_tanner_response("/logo.png", {"type": 1})
+        )
+        self.assertEqual(content, self.files["logo_hash"])
+        self.assertEqual(headers["Content-Type"], "image/png")
+        self.assertEqual(status_code, 200)
+        self.assertIsNone(handler.get_page_file("/logo.png"))
+        content.release()
+
+    def tearDown(self):
+        self.pack.close()
+        self.assertTrue(os.path.exists(os.path.join(self.main_page_path, PACK_NAME)))
+        shutil.rmtree(self.main_page_path)
@@ -0,0 +1,90 @@
+import unittest
+import shutil
+import os
+from unittest.mock import patch
+from snare.utils.asyncmock import AsyncMock
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.server_fixture import ServerFixture
+
+
+class TestServerConditionalRequest(ServerFixture, unittest.TestCase):
+    def setUp(self):
+        meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/style.css": {"hash": "css_hash", "headers": [{"Content-Type": "text/css"}]},
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": "text/html"}]},
+        }
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        with open(os.path.join(self.main_page_path, "index_hash"), "wb") as f:
+            f.write(b"<html><body><p>index</p></body></html>")
+        with open(os.path.join(self.main_page_path, "css_hash"), "wb") as f:
+            f.write(b"body { color: black; }\n" * 50)
+        with open(os.path.join(self.main_page_path, "404_hash"), "wb") as f:
+            f.write(b"<html><body>not found</body></html>")
+        self.start_server(meta, server_header="test_server", compression=True)
+
+    def test_validator_headers(self):
+        status, headers, _ = self.fetch("/index.html")
+        validator = self.handler.tanner_handler.page_index.validators["index_hash"]
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["ETag"], validator.etag)
+        self.assertEqual(headers["Last-Modified"], validator.last_modified)
+
+    def test_if_none_match(self):
+        _, headers, _ = self.fetch("/index.html")
+        with patch.object(self.handler.tanner_handler.pages, "read", AsyncMock()) as read_page:
+            status, not_modified_headers, body = self.fetch("/index.html", {"If-None-Match": headers["ETag"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(not_modified_headers["ETag"], headers["ETag"])
+        self.assertIn("sess_uuid=test_uuid", not_modified_headers["Set-Cookie"])
+        read_page.assert_not_called()
+        self.assertEqual(self.handler.tanner_handler.submit_data.call_count, 2)
+
+        status, _, _ = self.fetch("/index.html", {"If-None-Match": '"other"'})
+        self.assertEqual(status, 200)
+
+    def test_unsafe_method(self):
+        _, headers, _ = self.fetch("/index.html")
+        status, _, body = self.fetch("/index.html", {"If-None-Match": headers["ETag"]}, method="POST")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"<html><body><p>index</p></body></html>")
+        status, _, body = self.fetch("/index.html", {"If-None-Match": headers["ETag"]}, method="HEAD")
+        self.assertEqual(status, 304)
+
+    def test_if_modified_since(self):
+        _, headers, _ = self.fetch("/index.html")
+        status, _, body = self.fetch("/index.html", {"If-Modified-Since": headers["Last-Modified"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        status, _, _ = self.fetch("/index.html", {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"})
+        self.assertEqual(status, 200)
+
+    def test_encoded_variant(self):
+        status, headers, _ = self.fetch("/style.css", {"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        etag = self.handler.tanner_handler.page_index.validators["css_hash"].etag
+        self.assertEqual(headers["ETag"], etag[:-1] + '-gzip"')
+        status, _, _ = self.fetch("/style.css", {"Accept-Encoding": "gzip", "If-None-Match": headers["ETag"]})
+        self.assertEqual(status, 304)
+
+    def test_vary(self):
+        for accept_encoding in ("gzip", "identity", None):
+            _, headers, _ = self.fetch("/style.css", {"Accept-Encoding": accept_encoding} if accept_encoding else {})
+            self.assertEqual(headers["Vary"], "Accept-Encoding")
+        status, headers, _ = self.fetch("/style.css", {"If-None-Match": headers["ETag"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.handler.tanner_handler.compression = False
+        _, headers, _ = self.fetch("/style.css")
+        self.assertNotIn("Vary", headers)
+
+    def test_missing_page(self):
+        status, headers, _ = self.fetch("/missing.html", {"If-None-Match": "*"})
+        self.assertEqual(status, 404)
+        self.assertNotIn("ETag", headers)
+
+    def tearDown(self):
+        shutil.rmtree(self.main_page_path)
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 import asyncio
 import argparse
 import shutil
@@ -46,6 +46,7 @@ class TestHandleRequest(unittest.TestCase):
             },
         }
         self.loop = asyncio.new_event_loop()
+        self.addCleanup(patch.stopall)
         self.response_content = "<html><body></body></html>"
         self.response_headers = multidict.CIMultiDict([("Content-Type", "text/html")])
         self.response_status = 200
@@ -75,11 +76,13 @@ class TestHandleRequest(unittest.TestCase):
         self.handler.tanner_handler.create_data = Mock(return_value=self.request_data)
         self.handler.tanner_handler.submit_data = AsyncMock(return_value=event_result)
         self.handler.submit_slurp = AsyncMock()
-        web.Response.add_header = Mock()
-        web.Response.write = Mock()
-        web.Response.send_headers = Mock()
-        web.Response.write_eof = AsyncMock()
-        aiohttp.streams.EmptyStreamReader.read = AsyncMock(return_value=b"con1=test1&con2=test2")
+        patch.object(web.Response, "add_header", Mock(), create=True).start()
+        patch.object(web.Response, "write", Mock()).start()
+        patch.object(web.Response, "send_headers", Mock(), create=True).start()
+        patch.object(web.Response, "write_eof", AsyncMock()).start()
+        patch.object(
+            aiohttp.streams.EmptyStreamReader, "read", AsyncMock(return_value=b"con1=test1&con2=test2")
+        ).start()
         self.handler.tanner_handler.parse_tanner_response = AsyncMock(
             return_value=(
                 self.response_content,
@@ -114,7 +117,9 @@ class TestHandleRequest(unittest.TestCase):
             await self.handler.handle_request(self.request)
 
         self.loop.run_until_complete(test())
-        self.handler.tanner_handler.parse_tanner_response.assert_called_with(self.request.path_qs, {"type": 1})
+        self.handler.tanner_handler.parse_tanner_response.assert_called_with(
+            self.request.path_qs, {"type": 1}, pages=self.handler.tanner_handler.pages
+        )
 
     def test_no_prev_sess_uuid(self):
         self.request_data = {
@@ -132,7 +137,23 @@ class TestHandleRequest(unittest.TestCase):
             await self.handler.handle_request(self.request)
 
         self.loop.run_until_complete(test())
-        self.handler.tanner_handler.parse_tanner_response.assert_called_with(self.request.path_qs, {"type": 1})
+        self.handler.tanner_handler.parse_tanner_response.assert_called_with(
+            self.request.path_qs, {"type": 1}, pages=self.handler.tanner_handler.pages
+        )
+
+    def test_async_events(self):
+        self.handler.event_queue = Mock()
+        self.handler.event_queue.put = AsyncMock()
+
+        async def test():
+            await self.handler.handle_request(self.request)
+
+        self.loop.run_until_complete(test())
+        self.handler.event_queue.put.assert_called_with(self.request_data)
+        self.handler.tanner_handler.submit_data.assert_not_called()
+        self.handler.tanner_handler.parse_tanner_response.assert_called_with(
+            self.request.path_qs, {"type": 1}, pages=self.handler.tanner_handler.pages
+        )
 
     def tearDown(self):
         shutil.rmtree(self.main_page_path)
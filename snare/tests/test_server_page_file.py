@@ -0,0 +1,71 @@
+import unittest
+import shutil
+import os
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.server_fixture import ServerFixture
+
+
+class TestServerPageFile(ServerFixture, unittest.TestCase):
+    def setUp(self):
+        meta = {
+            "/big.bin": {"hash": "big_hash", "headers": [{"Content-Type": "application/octet-stream"}]},
+            "/small.bin": {"hash": "small_hash", "headers": [{"Content-Type": "application/octet-stream"}]},
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": "text/html"}]},
+        }
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.content = bytes(range(256)) * 8
+        with open(os.path.join(self.main_page_path, "big_hash"), "wb") as f:
+            f.write(self.content)
+        with open(os.path.join(self.main_page_path, "small_hash"), "wb") as f:
+            f.write(b"small")
+        self.start_server(meta, server_header="test_server", sendfile_min_size=1)
+
+    def test_full_body(self):
+        status, headers, body = self.fetch("/big.bin")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(headers["Server"], "test_server")
+        self.assertEqual(headers["Accept-Ranges"], "bytes")
+        self.assertIn("sess_uuid=test_uuid", headers["Set-Cookie"])
+        self.handler.tanner_handler.submit_data.assert_called()
+
+    def test_small_file(self):
+        status, headers, body = self.fetch("/small.bin")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"small")
+        self.assertNotIn("Accept-Ranges", headers)
+
+    def test_range(self):
+        status, headers, body = self.fetch("/big.bin", {"Range": "bytes=10-19"})
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(headers["Content-Range"], "bytes 10-19/{}".format(len(self.content)))
+
+    def test_if_none_match(self):
+        _, headers, _ = self.fetch("/big.bin")
+        status, _, body = self.fetch("/big.bin", {"If-None-Match": headers["ETag"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        status, _, _ = self.fetch("/big.bin", {"If-None-Match": '"other"'})
+        self.assertEqual(status, 200)
+
+    def test_if_modified_since(self):
+        _, headers, _ = self.fetch("/big.bin")
+        status, _, body = self.fetch("/big.bin", {"If-Modified-Since": headers["Last-Modified"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+
+    def test_unsafe_method(self):
+        _, headers, _ = self.fetch("/big.bin")
+        for conditional in (
+            {"If-None-Match": headers["ETag"]},
+            {"If-Modified-Since": headers["Last-Modified"]},
+            {"Range": "bytes=10-19"},
+        ):
+            status, _, body = self.fetch("/big.bin", conditional, method="POST")
+            self.assertEqual(status, 200)
+            self.assertEqual(body, self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.main_page_path)
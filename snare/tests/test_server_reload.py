@@ -0,0 +1,131 @@
+import unittest
+import asyncio
+import argparse
+import json
+import shutil
+import os
+from unittest.mock import patch
+from snare.page_set import load_page_set
+from snare.server import HttpRequestHandler
+from snare.utils.page_pack import create_page_pack
+from snare.utils.asyncmock import AsyncMock
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestServerReload(unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        self.meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/plain"}]},
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": "text/html"}]},
+        }
+        self.write_pages(self.meta, {"index_hash": b"old index"})
+        args = argparse.ArgumentParser().parse_args([])
+        args.full_page_path = self.main_page_path
+        args.tanner = "tanner.mushmush.org"
+        args.no_dorks = True
+        args.index_page = "/index.html"
+        args.server_header = None
+        args.slurp_enabled = False
+        uuid = "9c10172f-7ce2-4fb4-b1c6-abc70141db56".encode("utf-8")
+        self.handler = HttpRequestHandler(self.meta, args, uuid)
+        self.detection = {"type": 1}
+        self.loop = asyncio.new_event_loop()
+
+    def write_pages(self, meta, files):
+        with open(os.path.join(self.main_page_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        for file_name, content in files.items():
+            with open(os.path.join(self.main_page_path, file_name), "wb") as f:
+                f.write(content)
+
+    def reload(self):
+        async def reload():
+            return await self.handler.reload()
+
+        return self.loop.run_until_complete(reload())
+
+    def parse(self, path, pages=None):
+        return self.loop.run_until_complete(
+            self.handler.tanner_handler.parse_tanner_response(path, self.detection, pages=pages)
+        )
+
+    def test_reload(self):
+        self.assertEqual(self.parse("/index.html")[0], b"old index")
+        old_pages = self.handler.tanner_handler.pages
+        meta = dict(self.meta)
+        meta["/new.html"] = {"hash": "new_hash", "headers": [{"Content-Type": "text/plain"}]}
+        self.write_pages(meta, {"index_hash": b"new index", "new_hash": b"new page"})
+
+        reloaded = self.reload()
+        self.assertTrue(reloaded)
+        pages = self.handler.tanner_handler.pages
+        self.assertIsNot(pages, old_pages)
+        self.assertGreater(pages.generation, old_pages.generation)
+        self.assertEqual(self.handler.meta, meta)
+        self.assertEqual(self.parse("/index.html")[0], b"new index")
+        self.assertEqual(self.parse("/new.html")[0], b"new page")
+        # requests which started before the swap keep serving the old snapshot
+        self.assertEqual(self.parse("/index.html", pages=old_pages)[0], b"old index")
+        self.assertEqual(self.parse("/new.html", pages=old_pages)[2], 404)
+
+    def test_invalid_meta(self):
+        with open(os.path.join(self.main_page_path, "meta.json"), "w") as f:
+            f.write('{"/index.html": {}}')
+        old_pages = self.handler.tanner_handler.pages
+        reloaded = self.reload()
+        self.assertFalse(reloaded)
+        self.assertIs(self.handler.tanner_handler.pages, old_pages)
+        self.assertEqual(self.parse("/index.html")[0], b"old index")
+
+    def test_concurrent_reloads(self):
+        async def reload_twice():
+            first = self.handler.reload()
+            second = self.handler.reload()
+            self.assertIs(first, second)
+            await first
+
+        generation = self.handler.tanner_handler.pages.generation
+        self.loop.run_until_complete(reload_twice())
+        self.assertEqual(self.handler.tanner_handler.pages.generation, generation + 1)
+
+    def test_meta_tag(self):
+        config_path = os.path.join(self.main_page_path, "snare.cfg")
+        with open(config_path, "w") as f:
+            f.write("[WEB-TOOLS]\ngoogle = test google content\nbing =\n")
+        self.handler.run_args.config_path = config_path
+        meta = dict(self.meta)
+        meta["/index.html"] = {"hash": "index_hash", "headers": [{"Content-Type": "text/html"}]}
+        self.write_pages(meta, {"index_hash": b"<html><head></head><body>new index</body></html>"})
+
+        self.assertTrue(self.reload())
+        content = self.parse("/index.html")[0]
+        self.assertIn(b'content="test google content"', content)
+        self.assertIn(b"new index", content)
+
+    def test_pack_built_once(self):
+        self.write_pages(self.meta, {"index_hash": b"new index"})
+        with patch("snare.utils.page_pack.create_page_pack", wraps=create_page_pack) as create:
+
+            async def reload_all():
+                # every worker reloads on SIGHUP
+                return await asyncio.gather(*[self.loop.run_in_executor(None, self.load_pack) for _ in range(4)])
+
+            packs = self.loop.run_until_complete(reload_all())
+        self.assertEqual(create.call_count, 1)
+        for pack in packs:
+            self.assertEqual(bytes(pack.get("index_hash")), b"new index")
+            pack.close()
+
+    def load_pack(self):
+        return load_page_set(self.main_page_path, "/index.html", 1024, pack=True).page_pack
+
+    def test_dork_templates_reset(self):
+        self.handler.tanner_handler.html_handler.templates[(True, (0, "index_hash"))] = [b"stale"]
+        self.reload()
+        self.assertEqual(self.handler.tanner_handler.html_handler.templates, {})
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
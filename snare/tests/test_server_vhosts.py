@@ -0,0 +1,97 @@
+import unittest
+import json
+import shutil
+import os
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.server_fixture import ServerFixture
+
+
+class TestServerVhosts(ServerFixture, unittest.TestCase):
+    def setUp(self):
+        self.main_page_path = generate_unique_path()
+        self.site_path = generate_unique_path()
+        meta = self.create_site(self.main_page_path, b"main index", b"main 404")
+        self.create_site(self.site_path, b"site index", b"site 404", "text/plain")
+        self.config_path = os.path.join(self.main_page_path, "snare.cfg")
+        with open(self.config_path, "w") as f:
+            f.write("[WEB-TOOLS]\ngoogle = test google content\nbing =\n")
+        self.start_server(
+            meta,
+            config_path=self.config_path,
+            page_cache_size=1,
+            vhosts=[
+                ("site.example", self.site_path, "/home.html"),
+                ("www.site.example", self.site_path, "/home.html"),
+            ],
+        )
+
+    @staticmethod
+    def create_site(path, index, error_404, error_404_type="text/html"):
+        os.makedirs(path)
+        meta = {
+            "/index.html": {"hash": "index_hash", "headers": [{"Content-Type": "text/plain"}]},
+            "/home.html": {"hash": "home_hash", "headers": [{"Content-Type": "text/html"}]},
+            "/status_404": {"hash": "404_hash", "headers": [{"Content-Type": error_404_type}]},
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        with open(os.path.join(path, "index_hash"), "wb") as f:
+            f.write(index)
+        with open(os.path.join(path, "404_hash"), "wb") as f:
+            f.write(error_404)
+        with open(os.path.join(path, "home_hash"), "wb") as f:
+            f.write(b"<html><head></head><body>" + index + b"</body></html>")
+        return meta
+
+    def fetch_host(self, path, host):
+        status, self.headers, body = self.fetch(path, {"Host": host})
+        return status, body
+
+    def test_route_on_host(self):
+        self.assertEqual(self.fetch_host("/index.html", "site.example"), (200, b"site index"))
+        self.assertEqual(self.fetch_host("/index.html", "SITE.example:8080"), (200, b"site index"))
+        self.assertEqual(self.fetch_host("/index.html", "other.example"), (200, b"main index"))
+        tanner_handler = self.handler.tanner_handler
+        self.assertIs(tanner_handler.sites["site.example"], tanner_handler.sites["www.site.example"])
+
+    def test_site_404(self):
+        self.assertEqual(self.fetch_host("/missing", "site.example"), (404, b"site 404"))
+        self.assertEqual(self.headers["Content-Type"], "text/plain")
+        self.assertEqual(self.fetch_host("/missing", "other.example"), (404, b"main 404"))
+        self.assertEqual(self.headers["Content-Type"], "text/html")
+
+    def test_site_meta_tag(self):
+        # the index page of a virtual host gets the meta tags of the config at startup like the main one
+        status, content = self.fetch_host("/home.html", "site.example")
+        self.assertEqual(status, 200)
+        self.assertIn(b'content="test google content"', content)
+
+    def test_shared_cache_budget(self):
+        tanner_handler = self.handler.tanner_handler
+        self.fetch_host("/index.html", "site.example")
+        self.fetch_host("/index.html", "other.example")
+        budget = tanner_handler.cache_budget
+        self.assertEqual(budget.max_bytes, 1024 * 1024)
+        self.assertIs(tanner_handler.sites["site.example"].cache.budget, budget)
+        self.assertIs(tanner_handler.sites["site.example"].encoded_pages.budget, budget)
+        self.assertIs(tanner_handler.pages.cache.budget, budget)
+        self.assertEqual(budget.size, len(b"site index") + len(b"main index"))
+
+    def test_reload_sites(self):
+        self.assertEqual(self.fetch_host("/missing", "site.example"), (404, b"site 404"))
+        with open(os.path.join(self.site_path, "index_hash"), "wb") as f:
+            f.write(b"new site index")
+        with open(os.path.join(self.site_path, "404_hash"), "wb") as f:
+            f.write(b"new site 404")
+
+        async def reload():
+            return await self.handler.reload()
+
+        self.assertTrue(self.loop.run_until_complete(reload()))
+        self.assertEqual(self.fetch_host("/index.html", "www.site.example"), (200, b"new site index"))
+        self.assertEqual(self.fetch_host("/missing", "site.example"), (404, b"new site 404"))
+        self.assertEqual(self.fetch_host("/index.html", "other.example"), (200, b"main index"))
+
+    def tearDown(self):
+        shutil.rmtree(self.main_page_path)
+        shutil.rmtree(self.site_path)
@@ -33,5 +33,15 @@ class TestAddMetaTag(unittest.TestCase):
         config["WEB-TOOLS"] = dict(google="", bing="")
         assert add_meta_tag(self.page_dir, self.index_page, config, base_path="/opt/snare") is None
 
+    def test_add_meta_tag_without_head(self):
+        content = "<html><body>sample</body></html>"
+        with open(os.path.join(self.main_page_path, "index.html"), "w") as f:
+            f.write(content)
+        config = configparser.ConfigParser()
+        config["WEB-TOOLS"] = dict(google="test google content", bing="")
+        add_meta_tag(self.page_dir, self.index_page, config, base_path="/opt/snare")
+        with open(os.path.join(self.main_page_path, "index.html")) as main:
+            self.assertEqual(main.read(), content)
+
     def tearDown(self):
         shutil.rmtree(self.main_page_path)
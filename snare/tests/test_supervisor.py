@@ -0,0 +1,84 @@
+import unittest
+import os
+import signal
+import socket
+import threading
+import time
+from snare.utils.supervisor import WorkerSupervisor, create_reuseport_socket
+
+
+def crashing_worker(sock):
+    os._exit(1)
+
+
+def serving_worker(sock):
+    sock.setblocking(True)
+    while True:
+        conn, _ = sock.accept()
+        conn.sendall(str(os.getpid()).encode())
+        conn.close()
+
+
+def reloading_worker(sock, pipe):
+    signal.signal(signal.SIGHUP, lambda signum, frame: os.write(pipe, b"r"))
+    while True:
+        time.sleep(0.1)
+
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)}
+        self.sockets = [create_reuseport_socket("127.0.0.1", 0)]
+        self.port = self.sockets[0].getsockname()[1]
+        self.sockets.append(create_reuseport_socket("127.0.0.1", self.port))
+
+    def run_supervisor(self, supervisor, duration):
+        timer = threading.Timer(duration, supervisor.handle_signal, (signal.SIGTERM, None))
+        timer.start()
+        supervisor.run()
+        timer.join()
+
+    def test_shared_port(self):
+        self.assertEqual(self.sockets[1].getsockname()[1], self.port)
+
+    def test_restart_crashed_workers(self):
+        supervisor = WorkerSupervisor(crashing_worker, self.sockets, restart_delay=0.1)
+        self.run_supervisor(supervisor, 1.0)
+        self.assertGreaterEqual(supervisor.restarts, 2)
+
+    def test_serve_and_stop(self):
+        supervisor = WorkerSupervisor(serving_worker, self.sockets, stop_timeout=2.0)
+        pids = []
+
+        def connect():
+            time.sleep(0.3)
+            for _ in range(4):
+                with socket.create_connection(("127.0.0.1", self.port), timeout=2) as conn:
+                    pids.append(int(conn.recv(16)))
+
+        client = threading.Thread(target=connect)
+        client.start()
+        self.run_supervisor(supervisor, 1.0)
+        client.join()
+        self.assertEqual(len(pids), 4)
+        self.assertTrue(set(pids) <= {worker.pid for worker in supervisor.workers.values()})
+        self.assertFalse(any(worker.is_alive() for worker in supervisor.workers.values()))
+        self.assertEqual(supervisor.restarts, 0)
+
+    def test_forward_reload(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        supervisor = WorkerSupervisor(reloading_worker, self.sockets, args=(write_fd,), stop_timeout=2.0)
+        timer = threading.Timer(0.5, supervisor.handle_reload, (signal.SIGHUP, None))
+        timer.start()
+        self.run_supervisor(supervisor, 1.0)
+        timer.join()
+        self.assertEqual(supervisor.reloads, 1)
+        self.assertEqual(os.read(read_fd, 16), b"rr")
+
+    def tearDown(self):
+        for signum, handler in self.handlers.items():
+            signal.signal(signum, handler)
+        for sock in self.sockets:
+            sock.close()
@@ -210,7 +210,9 @@ class TestParseTannerResponse(unittest.TestCase):
             ) = await self.handler.parse_tanner_response(self.requested_name, self.detection)
 
         self.loop.run_until_complete(test())
-        self.handler.html_handler.handle_content.assert_called_with(self.call_content)
+        self.handler.html_handler.handle_content.assert_called_with(
+            self.call_content, key=(self.handler.pages.generation, "hash_name")
+        )
 
     def test_parse_exception(self):
         self.detection = {}
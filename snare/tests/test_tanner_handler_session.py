@@ -0,0 +1,59 @@
+import unittest
+import asyncio
+import argparse
+import shutil
+import os
+from snare.tanner_handler import TannerHandler
+from snare.utils.page_path_generator import generate_unique_path
+
+
+class TestTannerSession(unittest.TestCase):
+    def setUp(self):
+        run_args = argparse.ArgumentParser()
+        run_args.add_argument("--tanner")
+        run_args.add_argument("--page-dir")
+        self.main_page_path = generate_unique_path()
+        os.makedirs(self.main_page_path)
+        page_dir = self.main_page_path.rsplit("/")[-1]
+        args = run_args.parse_args(["--page-dir", page_dir])
+        args_dict = vars(args)
+        args_dict["full_page_path"] = self.main_page_path
+        args.tanner = "tanner.mushmush.org"
+        args.no_dorks = True
+        args.tanner_pool_size = 10
+        args.tanner_pool_per_host = 5
+        self.handler = TannerHandler(args, {}, "test_uuid")
+        self.loop = asyncio.new_event_loop()
+
+    def test_session_reused(self):
+        async def test():
+            first = self.handler.get_session()
+            second = self.handler.get_session()
+            self.assertIs(first, second)
+            self.assertIs(self.handler.html_handler.session, first)
+            await self.handler.close_session()
+
+        self.loop.run_until_complete(test())
+
+    def test_session_limits(self):
+        async def test():
+            session = self.handler.get_session()
+            self.assertEqual(session.connector.limit, 10)
+            self.assertEqual(session.connector.limit_per_host, 5)
+            await self.handler.close_session()
+
+        self.loop.run_until_complete(test())
+
+    def test_close_session(self):
+        async def test():
+            session = self.handler.get_session()
+            await self.handler.close_session()
+            self.assertTrue(session.closed)
+            self.assertIsNone(self.handler.session)
+            self.assertIsNone(self.handler.html_handler.session)
+
+        self.loop.run_until_complete(test())
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.main_page_path)
@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 import asyncio
 import argparse
 import shutil
@@ -25,6 +26,7 @@ class TestSubmitData(unittest.TestCase):
         args_dict = vars(args)
         args_dict["full_page_path"] = self.main_page_path
         self.loop = asyncio.new_event_loop()
+        self.addCleanup(patch.stopall)
         self.data = {
             "method": "GET",
             "path": "/",
@@ -44,19 +46,23 @@ class TestSubmitData(unittest.TestCase):
             "cookies": "test_cookies",
             "sess_uuid": "test_uuid",
         }
-        aiohttp.ClientSession.post = AsyncMock(
-            return_value=aiohttp.ClientResponse(
-                url=yarl.URL("http://www.example.com"),
-                method="GET",
-                writer=None,
-                continue100=1,
-                timer=None,
-                request_info=None,
-                traces=None,
-                loop=self.loop,
-                session=None,
-            )
-        )
+        patch.object(
+            aiohttp.ClientSession,
+            "post",
+            AsyncMock(
+                return_value=aiohttp.ClientResponse(
+                    url=yarl.URL("http://www.example.com"),
+                    method="GET",
+                    writer=None,
+                    continue100=1,
+                    timer=None,
+                    request_info=None,
+                    traces=None,
+                    loop=self.loop,
+                    session=None,
+                )
+            ),
+        ).start()
         uuid = "test_uuid"
         args.tanner = "tanner.mushmush.org"
         args.no_dorks = True
@@ -64,7 +70,9 @@ class TestSubmitData(unittest.TestCase):
         self.result = None
 
     def test_post_data(self):
-        aiohttp.ClientResponse.json = AsyncMock(return_value=dict(detection={"type": 1}, sess_uuid="test_uuid"))
+        patch.object(
+            aiohttp.ClientResponse, "json", AsyncMock(return_value=dict(detection={"type": 1}, sess_uuid="test_uuid"))
+        ).start()
 
         async def test():
             self.result = await self.handler.submit_data(self.data)
@@ -75,7 +83,9 @@ class TestSubmitData(unittest.TestCase):
         )
 
     def test_event_result(self):
-        aiohttp.ClientResponse.json = AsyncMock(return_value=dict(detection={"type": 1}, sess_uuid="test_uuid"))
+        patch.object(
+            aiohttp.ClientResponse, "json", AsyncMock(return_value=dict(detection={"type": 1}, sess_uuid="test_uuid"))
+        ).start()
 
         async def test():
             self.result = await self.handler.submit_data(self.data)
@@ -84,7 +94,7 @@ class TestSubmitData(unittest.TestCase):
         self.assertEqual(self.result, dict(detection={"type": 1}, sess_uuid="test_uuid"))
 
     def test_submit_data_error(self):
-        aiohttp.ClientResponse.json = AsyncMock(side_effect=JSONDecodeError("ERROR", "", 0))
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(side_effect=JSONDecodeError("ERROR", "", 0))).start()
 
         async def test():
             self.result = await self.handler.submit_data(self.data)
@@ -95,15 +105,18 @@ class TestSubmitData(unittest.TestCase):
                 "Error submitting data: ERROR: line 1 column 1 (char 0) {}".format(self.data),
                 log.output[0],
             )
+        self.assertEqual(self.handler.counters, dict(errors=0, fallbacks=1))
 
     def test_event_result_exception(self):
-        aiohttp.ClientResponse.json = AsyncMock(side_effect=Exception())
+        patch.object(aiohttp.ClientResponse, "json", AsyncMock(side_effect=Exception())).start()
 
         async def test():
             self.result = await self.handler.submit_data(self.data)
 
         with self.assertRaises(Exception):
             self.loop.run_until_complete(test())
+        self.assertEqual(self.handler.counters["errors"], 1)
 
     def tearDown(self):
+        self.loop.run_until_complete(self.handler.close_session())
         shutil.rmtree(self.main_page_path)
@@ -0,0 +1,111 @@
+import unittest
+import asyncio
+import argparse
+import http.client
+import json
+import shutil
+import os
+import time
+from snare.html_handler import HtmlHandler
+from snare.tanner_handler import TannerHandler
+from snare.utils.page_path_generator import generate_unique_path
+from snare.utils.tanner_stub import SlurpStub, TannerStub, parse_detections
+
+
+class TestTannerStub(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.stubs = []
+
+    def start(self, stub):
+        self.loop.run_until_complete(stub.start("127.0.0.1", 0))
+        self.stubs.append(stub)
+        return stub
+
+    def request(self, stub, method, path, body=None):
+        def request():
+            conn = http.client.HTTPConnection("127.0.0.1", stub.port, timeout=5)
+            conn.request(method, path, body=json.dumps(body) if body is not None else None)
+            response = conn.getresponse()
+            result = response.status, response.read()
+            conn.close()
+            return result
+
+        return self.loop.run_until_complete(self.loop.run_in_executor(None, request))
+
+    def test_parse_detections(self):
+        self.assertEqual(parse_detections("1=0.8,2=0.2"), {1: 0.8, 2: 0.2})
+        self.assertEqual(parse_detections("3"), {3: 1.0})
+        with self.assertRaises(ValueError):
+            parse_detections("4=1")
+
+    def test_detection_mix(self):
+        stub = self.start(TannerStub(detections={2: 1, 3: 1}, seed=1))
+        types = set()
+        for _ in range(20):
+            status, body = self.request(stub, "POST", "/event", {"path": "/"})
+            detection = json.loads(body)["response"]["message"]["detection"]
+            types.add(detection["type"])
+            if detection["type"] == 2:
+                self.assertEqual(detection["payload"]["page"], "/index.html")
+            else:
+                self.assertEqual(detection["payload"], {"status_code": 500})
+        self.assertEqual(types, {2, 3})
+
+    def test_seeded_draws(self):
+        first = TannerStub(detections={1: 1, 2: 1, 3: 1}, seed=7)
+        second = TannerStub(detections={1: 1, 2: 1, 3: 1}, seed=7)
+        types = [[stub.detect({})["detection"]["type"] for _ in range(10)] for stub in (first, second)]
+        self.assertEqual(types[0], types[1])
+
+    def test_error_rate(self):
+        stub = self.start(TannerStub(error_rate=1.0))
+        status, _ = self.request(stub, "POST", "/event", {"path": "/"})
+        self.assertEqual(status, 500)
+        status, _ = self.request(stub, "GET", "/version")
+        self.assertEqual(status, 200)
+        self.assertEqual(stub.counters["errors"], 1)
+
+    def test_latency(self):
+        stub = self.start(TannerStub(latency=0.2))
+        start = time.monotonic()
+        self.request(stub, "GET", "/dorks")
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_slurp(self):
+        stub = self.start(SlurpStub())
+        status, body = self.request(stub, "POST", "/api?auth=slurp&chan=snare_test&msg=/index.html")
+        self.assertEqual((status, body), (200, b"OK"))
+        self.assertEqual(stub.messages, [dict(auth="slurp", chan="snare_test", msg="/index.html")])
+
+    def test_snare_round_trip(self):
+        stub = self.start(TannerStub(error_rate=0.5, seed=3))
+        dork_stub = self.start(TannerStub(dorks=5))
+        main_page_path = generate_unique_path()
+        os.makedirs(main_page_path)
+        self.addCleanup(shutil.rmtree, main_page_path)
+        args = argparse.ArgumentParser().parse_args([])
+        args.full_page_path = main_page_path
+        args.tanner = "127.0.0.1"
+        args.tanner_port = stub.port
+        args.no_dorks = True
+        handler = TannerHandler(args, {}, "test_uuid")
+        dork_handler = HtmlHandler(False, "127.0.0.1", tanner_port=dork_stub.port)
+
+        async def test():
+            results = [await handler.submit_data(dict(uuid="test_uuid", path="/")) for _ in range(10)]
+            dorks = await dork_handler.get_dorks()
+            await handler.close_session()
+            return results, dorks
+
+        with self.assertLogs(level="ERROR"):
+            results, dorks = self.loop.run_until_complete(test())
+        self.assertEqual(len(results), 10)
+        self.assertEqual(len(dorks), 5)
+        self.assertGreater(handler.counters["fallbacks"], 0)
+        self.assertEqual(handler.counters["fallbacks"], stub.counters["errors"])
+
+    def tearDown(self):
+        for stub in self.stubs:
+            self.loop.run_until_complete(stub.stop())
+        self.loop.close()
@@ -1,5 +1,17 @@
+import atexit
+import contextlib
+import fcntl
+import gzip
 import logging
 import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+# Queue handlers of the process, their listeners are restarted in forked workers and stopped at exit
+QUEUE_HANDLERS = []
 
 
 class LevelFilter(logging.Filter):
@@ -14,9 +26,150 @@ class LevelFilter(logging.Filter):
     # "<" instead of "<=": since logger.setLevel is inclusive, this should be exclusive
 
 
+def compress_file(source, dest):
+    with open(source, "rb") as plain, gzip.open(dest, "wb") as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates once the file reaches max_bytes or is interval seconds old, whichever comes first.
+    Rotated files are gzipped by a thread of their own. Workers share the file: a handler reopens it when
+    another process rotated it away, and rotations take a lock file whose mtime is the time of the last one.
+    """
+
+    def __init__(self, filename, max_bytes=0, interval=0, backup_count=5, encoding="utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.interval = interval
+        self.lock_path = self.baseFilename + ".lock"
+        with open(self.lock_path, "a"):
+            pass
+        self.mark_rotation()
+        self.compression = None
+        self.file_id = self.stat_file()
+
+    def stat_file(self):
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def reopen_if_moved(self):
+        file_id = self.stat_file()
+        if file_id != self.file_id or file_id is None:
+            if self.stream is not None:
+                self.stream.close()
+            self.stream = self._open()
+            self.file_id = self.stat_file()
+
+    @contextlib.contextmanager
+    def rotation_lock(self):
+        # opened every time, a descriptor inherited over fork would share the lock with the parent
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def mark_rotation(self):
+        os.utime(self.lock_path)
+        self.rollover_at = time.time() + self.interval
+
+    def shouldRollover(self, record):
+        self.reopen_if_moved()
+        if self.interval and time.time() >= self.rollover_at:
+            # another process may have rotated the file since
+            self.rollover_at = os.stat(self.lock_path).st_mtime + self.interval
+            if time.time() >= self.rollover_at:
+                self.stream.seek(0, 2)
+                if self.stream.tell():
+                    return True
+                # nothing to rotate yet
+                self.rollover_at = time.time() + self.interval
+        return super().shouldRollover(record)
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                # the last rotated file is compressed and numbered first, its thread takes the lock as well
+                self.wait_compression()
+                with self.rotation_lock():
+                    # checked again, the process holding the lock before may have rotated the file
+                    if self.shouldRollover(record):
+                        self.doRollover()
+            logging.FileHandler.emit(self, record)
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self):
+        # done by emit before it takes the lock, which the compression thread needs as well
+        self.wait_compression()
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.backupCount > 0 and os.path.exists(self.baseFilename):
+            # unique to the process, so the compression never touches a file another process rotated
+            plain = "{}.{}".format(self.baseFilename, os.getpid())
+            os.rename(self.baseFilename, plain)
+            self.compression = threading.Thread(target=self.compress_backup, args=(plain,), daemon=True)
+            self.compression.start()
+        elif os.path.exists(self.baseFilename):
+            # no backups are kept, the file starts over instead of growing past max_bytes
+            os.truncate(self.baseFilename, 0)
+        self.stream = self._open()
+        self.file_id = self.stat_file()
+        self.mark_rotation()
+
+    def compress_backup(self, plain):
+        compressed = plain + ".gz"
+        compress_file(plain, compressed)
+        # the backups are only numbered once compressed, other processes may rotate meanwhile
+        with self.rotation_lock():
+            for idx in range(self.backupCount - 1, 0, -1):
+                backup = "{}.{}.gz".format(self.baseFilename, idx)
+                if os.path.exists(backup):
+                    os.replace(backup, "{}.{}.gz".format(self.baseFilename, idx + 1))
+            os.replace(compressed, "{}.1.gz".format(self.baseFilename))
+
+    def wait_compression(self):
+        if self.compression is not None:
+            self.compression.join()
+
+    def close(self):
+        super().close()
+        self.wait_compression()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread, drops and counts them when the queue is full"""
+
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def restart(self):
+        # the listener thread didn't survive the fork and the queue lock may be held by it
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.listener.handlers, respect_handler_level=True)
+        self.listener.start()
+
+
 class Logger:
     @staticmethod
-    def create_logger(debug_filename, err_filename, logger_name):
+    def create_logger(
+        debug_filename, err_filename, logger_name, max_bytes=0, interval=0, backup_count=5, queue_size=10000
+    ):
         logger = logging.getLogger(logger_name)
         logger.setLevel(logging.DEBUG)
         logger.propagate = False
@@ -26,21 +179,38 @@ class Logger:
         )
 
         # ERROR log to 'snare.err'
-        error_log_handler = logging.handlers.RotatingFileHandler(err_filename, encoding="utf-8")
+        error_log_handler = RotatingLogHandler(err_filename, max_bytes, interval, backup_count)
         error_log_handler.setLevel(logging.ERROR)
         error_log_handler.setFormatter(formatter)
-        logger.addHandler(error_log_handler)
 
         # DEBUG log to 'snare.log'
-        debug_log_handler = logging.handlers.RotatingFileHandler(debug_filename, encoding="utf-8")
+        debug_log_handler = RotatingLogHandler(debug_filename, max_bytes, interval, backup_count)
         debug_log_handler.setLevel(logging.DEBUG)
         debug_log_handler.setFormatter(formatter)
         max_level_filter = LevelFilter(logging.ERROR)
         debug_log_handler.addFilter(max_level_filter)
-        logger.addHandler(debug_log_handler)
+
+        # the files are written by a listener thread, logging on the event loop only enqueues
+        queue_handler = DroppingQueueHandler([error_log_handler, debug_log_handler], queue_size)
+        queue_handler.listener.start()
+        QUEUE_HANDLERS.append(queue_handler)
+        logger.addHandler(queue_handler)
 
         return logger
 
+    @staticmethod
+    def dropped_records():
+        return sum(handler.dropped for handler in QUEUE_HANDLERS)
+
+    @staticmethod
+    def stop():
+        """Writes out the queued records and closes the files"""
+        while QUEUE_HANDLERS:
+            handler = QUEUE_HANDLERS.pop()
+            handler.listener.stop()
+            for file_handler in handler.listener.handlers:
+                file_handler.close()
+
     @staticmethod
     def create_clone_logger(log_filename, logger_name):
         logger = logging.getLogger(logger_name)
@@ -53,3 +223,14 @@ class Logger:
         debug_log_handler.setLevel(logging.DEBUG)
         debug_log_handler.setFormatter(formatter)
         logger.addHandler(debug_log_handler)
+
+
+def restart_listeners():
+    for handler in QUEUE_HANDLERS:
+        handler.restart()
+
+
+# Python 3.6 has no fork hook, its workers restart the listeners themselves
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_listeners)
+atexit.register(Logger.stop)
@@ -0,0 +1,111 @@
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import struct
+
+PACK_NAME = "pages.pack"
+MAGIC = b"SNAREPK1"
+# magic, offset and length of the JSON index
+HEADER = struct.Struct("<8sQQ")
+
+
+def create_page_pack(path, meta, pack_name=PACK_NAME):
+    """
+    Packs the hashed files of a cloned site into one file.
+    The bodies are followed by a JSON index holding the meta and the offset/length of every body.
+    """
+    files = {}
+    pack_path = os.path.join(path, pack_name)
+    # unique to the process, the pack is only ever replaced by a complete one
+    tmp_path = "{}.{}.tmp".format(pack_path, os.getpid())
+    with open(tmp_path, "wb") as pack:
+        pack.write(HEADER.pack(MAGIC, 0, 0))
+        for info in meta.values():
+            file_name = info["hash"]
+            file_path = os.path.join(path, file_name)
+            if file_name in files or not os.path.isfile(file_path):
+                continue
+            offset = pack.tell()
+            with open(file_path, "rb") as fh:
+                shutil.copyfileobj(fh, pack)
+            files[file_name] = [offset, pack.tell() - offset]
+        index = json.dumps(dict(meta=meta, files=files)).encode("utf-8")
+        index_offset = pack.tell()
+        pack.write(index)
+        pack.seek(0)
+        pack.write(HEADER.pack(MAGIC, index_offset, len(index)))
+    os.replace(tmp_path, pack_path)
+    return pack_path
+
+
+def page_pack_outdated(path, meta, pack_name=PACK_NAME):
+    """Whether the pack is missing or older than meta.json or one of the page files, e.g. after a new clone"""
+    try:
+        packed = os.stat(os.path.join(path, pack_name)).st_mtime
+    except FileNotFoundError:
+        return True
+    for file_name in ["meta.json"] + [info["hash"] for info in meta.values()]:
+        try:
+            if os.stat(os.path.join(path, file_name)).st_mtime > packed:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def update_page_pack(path, meta, pack_name=PACK_NAME):
+    """
+    Builds the pack again when it is outdated and returns its path. Processes updating it at the same time,
+    like the workers reloading on SIGHUP, wait for the first one to build it and then just open it.
+    """
+    pack_path = os.path.join(path, pack_name)
+    with open(pack_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if page_pack_outdated(path, meta, pack_name):
+            create_page_pack(path, meta, pack_name)
+    return pack_path
+
+
+class PagePack:
+    def __init__(self, pack_path):
+        self.path = pack_path
+        with open(pack_path, "rb") as fh:
+            self.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.meta, self.files = self.read_index()
+        except ValueError:
+            self.mmap.close()
+            raise
+        self.data = memoryview(self.mmap)
+
+    def read_index(self):
+        if len(self.mmap) < HEADER.size:
+            raise ValueError("{} is truncated".format(self.path))
+        magic, index_offset, index_length = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError("{} is not a page pack".format(self.path))
+        if index_offset < HEADER.size or index_offset + index_length > len(self.mmap):
+            raise ValueError("{} is truncated".format(self.path))
+        index = json.loads(self.mmap[index_offset : index_offset + index_length].decode("utf-8"))
+        for offset, length in index["files"].values():
+            if offset + length > index_offset:
+                raise ValueError("{} is corrupted".format(self.path))
+        return index["meta"], index["files"]
+
+    def get(self, file_name):
+        """Returns the body as a memoryview over the mapped pack, without copying it"""
+        try:
+            offset, length = self.files[file_name]
+        except KeyError:
+            return None
+        return self.data[offset : offset + length]
+
+    def close(self):
+        self.data.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # bodies handed out still refer to the mapping, it is unmapped once they are collected
+            pass
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import http.client
+from snare.server import HttpRequestHandler
+from snare.utils.asyncmock import AsyncMock
+
+SNARE_UUID = "9c10172f-7ce2-4fb4-b1c6-abc70141db56".encode("utf-8")
+EVENT_RESULT = dict(response=dict(message=dict(detection={"type": 1}, sess_uuid="test_uuid")))
+
+
+class ServerFixture:
+    """
+    Mixin for test cases serving main_page_path on a free local port, the tanner events are mocked.
+    The server is stopped by a cleanup of the test case.
+    """
+
+    def start_server(self, meta, **run_args):
+        args = argparse.ArgumentParser().parse_args([])
+        args.full_page_path = self.main_page_path
+        args.tanner = "tanner.mushmush.org"
+        args.no_dorks = True
+        args.index_page = "/index.html"
+        args.host_ip = "127.0.0.1"
+        args.port = 0
+        args.server_header = None
+        args.slurp_enabled = False
+        vars(args).update(run_args)
+        self.handler = HttpRequestHandler(meta, args, SNARE_UUID)
+        self.handler.tanner_handler.submit_data = AsyncMock(return_value=EVENT_RESULT)
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.handler.start())
+        self.addCleanup(self.stop_server)
+        self.port = self.handler.runner.addresses[0][1]
+
+    def stop_server(self):
+        self.loop.run_until_complete(self.handler.stop())
+        self.loop.close()
+
+    def fetch(self, path, headers=None, method="GET", port=None):
+        def request():
+            conn = http.client.HTTPConnection("127.0.0.1", port or self.port, timeout=5)
+            conn.request(method, path, headers=headers or {})
+            response = conn.getresponse()
+            result = response.status, response.headers, response.read()
+            conn.close()
+            return result
+
+        return self.loop.run_until_complete(self.loop.run_in_executor(None, request))
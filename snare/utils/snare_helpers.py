@@ -40,7 +40,7 @@ class Converter:
     def convert(self, path):
         files_to_convert = []
 
-        for (dirpath, dirnames, filenames) in walk(path):
+        for dirpath, dirnames, filenames in walk(path):
             for fn in filenames:
                 files_to_convert.append(os.path.join(dirpath, fn))
 
@@ -65,31 +65,56 @@ class Converter:
 
 
 def add_meta_tag(page_dir, index_page, config, base_path):
+    main_page_path = os.path.join(os.path.join(base_path, "pages"), page_dir, index_page)
+    add_meta_tag_to_file(main_page_path, config)
+
+
+def add_meta_tag_to_file(page_path, config):
+    """Adds the search engine verification tags of the config, the page is only written when one was missing"""
     google_content = config["WEB-TOOLS"]["google"]
     bing_content = config["WEB-TOOLS"]["bing"]
 
     if not google_content and not bing_content:
         return
 
-    main_page_path = os.path.join(os.path.join(base_path, "pages"), page_dir, index_page)
-    with open(main_page_path) as main:
+    with open(page_path) as main:
         main_page = main.read()
     soup = BeautifulSoup(main_page, "html.parser")
+    if soup.head is None:
+        # nowhere to put the tags
+        return
 
+    added = False
     if google_content and soup.find("meta", attrs={"name": "google-site-verification"}) is None:
         google_meta = soup.new_tag("meta")
         google_meta.attrs["name"] = "google-site-verification"
         google_meta.attrs["content"] = google_content
         soup.head.append(google_meta)
+        added = True
     if bing_content and soup.find("meta", attrs={"name": "msvalidate.01"}) is None:
         bing_meta = soup.new_tag("meta")
         bing_meta.attrs["name"] = "msvalidate.01"
         bing_meta.attrs["content"] = bing_content
         soup.head.append(bing_meta)
+        added = True
+    if not added:
+        return
 
     html = soup.prettify("utf-8")
-    with open(main_page_path, "wb") as file:
+    # replaced in one step, workers reloading the pages may read it meanwhile
+    tmp_path = "{}.{}.tmp".format(page_path, os.getpid())
+    with open(tmp_path, "wb") as file:
         file.write(html)
+    os.replace(tmp_path, page_path)
+
+
+def add_index_meta_tag(directory, meta_info, index_page, config):
+    """add_meta_tag for the index page of a page directory, returns False when the page is missing"""
+    page_path = os.path.join(directory, meta_info[index_page]["hash"])
+    if not os.path.exists(page_path):
+        return False
+    add_meta_tag_to_file(page_path, config)
+    return True
 
 
 def check_meta_file(meta_info):
@@ -0,0 +1,90 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import time
+
+
+def create_reuseport_socket(host, port, backlog=128):
+    """Creates a listening socket which other sockets can bind to the same address with SO_REUSEPORT"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+class WorkerSupervisor:
+    """Runs one worker process per socket and restarts the workers which exit"""
+
+    def __init__(self, target, sockets, args=(), restart_delay=1.0, stop_timeout=10.0):
+        self.target = target
+        self.sockets = sockets
+        self.args = args
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+        self.context = multiprocessing.get_context("fork")
+        self.workers = {}
+        self.started = {}
+        self.restarts = 0
+        self.reloads = 0
+        self.stopping = False
+        self.logger = logging.getLogger(__name__)
+
+    def start_worker(self, idx):
+        worker = self.context.Process(target=self.target, args=(self.sockets[idx],) + tuple(self.args))
+        worker.start()
+        self.workers[idx] = worker
+        self.started[idx] = time.monotonic()
+        self.logger.info("Started worker %s with pid %s", idx, worker.pid)
+
+    def handle_signal(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        # every worker reloads its own pages, workers started later see the count and reload at startup
+        self.reloads += 1
+        for worker in self.workers.values():
+            if worker.is_alive():
+                os.kill(worker.pid, signal.SIGHUP)
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.handle_signal)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        for idx in range(len(self.sockets)):
+            self.start_worker(idx)
+        try:
+            while not self.stopping:
+                alive = [worker.sentinel for worker in self.workers.values() if worker.is_alive()]
+                multiprocessing.connection.wait(alive, timeout=self.restart_delay)
+                for idx, worker in list(self.workers.items()):
+                    if worker.is_alive() or self.stopping:
+                        continue
+                    # don't spin on a worker which dies right after it starts
+                    if time.monotonic() - self.started[idx] < self.restart_delay:
+                        continue
+                    self.logger.error("Worker %s (pid %s) exited with %s, restarting", idx, worker.pid, worker.exitcode)
+                    self.restarts += 1
+                    self.start_worker(idx)
+        finally:
+            self.stop()
+
+    def stop(self):
+        for worker in self.workers.values():
+            if worker.is_alive():
+                worker.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for worker in self.workers.values():
+            worker.join(max(0, deadline - time.monotonic()))
+            if worker.is_alive():
+                os.kill(worker.pid, signal.SIGKILL)
+                worker.join()
+        for sock in self.sockets:
+            sock.close()
+        self.logger.info("All workers stopped")
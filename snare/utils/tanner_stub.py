@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import random
+import ssl
+import uuid
+
+from aiohttp import web
+
+
+def parse_detections(value):
+    """Parses a detection mix like "1=0.8,2=0.15,3=0.05" into {type: weight}"""
+    detections = {}
+    for item in value.split(","):
+        detection_type, _, weight = item.partition("=")
+        detections[int(detection_type)] = float(weight or 1)
+    if not detections or any(detection_type not in (1, 2, 3) for detection_type in detections):
+        raise ValueError("detection types are 1, 2 and 3: {}".format(value))
+    return detections
+
+
+class TannerStub:
+    """
+    Minimal stand-in for the TANNER service, used to run and benchmark snare without network access.
+    Latency, errors and detection types are drawn from a seeded generator, so runs can be repeated.
+    """
+
+    def __init__(
+        self,
+        version="0.6.0",
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        detections=None,
+        payload_page="/index.html",
+        dorks=50,
+        seed=None,
+    ):
+        self.version = version
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.detections = detections or {1: 1.0}
+        self.payload_page = payload_page
+        self.dorks = dorks
+        self.random = random.Random(seed)
+        self.events = []
+        self.counters = dict(events=0, errors=0, dorks=0)
+        self.port = None
+
+    async def delay(self):
+        latency = self.latency + self.random.uniform(0, self.jitter) if self.jitter else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+
+    def failed(self):
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.counters["errors"] += 1
+            return True
+        return False
+
+    def detect(self, data):
+        self.events.append(data)
+        self.counters["events"] += 1
+        sess_uuid = (data.get("cookies") or {}).get("sess_uuid") or str(uuid.uuid4())
+        detection_type = self.random.choices(list(self.detections), weights=list(self.detections.values()))[0]
+        detection = {"name": "index", "order": 1, "type": detection_type, "version": self.version}
+        if detection_type == 2:
+            detection["name"] = "xss"
+            detection["payload"] = {"page": self.payload_page, "value": "<script>alert('snare')</script>"}
+        elif detection_type == 3:
+            detection["name"] = "lfi"
+            detection["payload"] = {"status_code": 500}
+        return {"detection": detection, "sess_uuid": sess_uuid}
+
+    def error_response(self):
+        # not JSON, so snare falls back to the default detection
+        return web.Response(status=500, text="stub error")
+
+    async def handle_version(self, request):
+        return web.json_response({"version": self.version})
+
+    async def handle_event(self, request):
+        data = await request.json()
+        await self.delay()
+        if self.failed():
+            return self.error_response()
+        return web.json_response({"version": self.version, "response": {"message": self.detect(data)}})
+
+    async def handle_events(self, request):
+        events = await request.json()
+        await self.delay()
+        if self.failed():
+            return self.error_response()
+        messages = [self.detect(data) for data in events]
+        return web.json_response({"version": self.version, "response": {"messages": messages}})
+
+    async def handle_dorks(self, request):
+        await self.delay()
+        if self.failed():
+            return self.error_response()
+        self.counters["dorks"] += 1
+        dorks = ["/{:08x}/{}.php?id={}".format(self.random.getrandbits(32), idx, idx) for idx in range(self.dorks)]
+        return web.json_response({"version": self.version, "response": {"dorks": dorks}})
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes(
+            [
+                web.get("/version", self.handle_version),
+                web.post("/event", self.handle_event),
+                web.post("/events", self.handle_events),
+                web.get("/dorks", self.handle_dorks),
+            ]
+        )
+        return app
+
+    async def start(self, host="127.0.0.1", port=8090):
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class SlurpStub:
+    """Stand-in for the slurp nsq logging API, snare connects with HTTPS but doesn't verify the certificate"""
+
+    def __init__(self, ssl_context=None):
+        self.ssl_context = ssl_context
+        self.messages = []
+        self.port = None
+
+    async def handle_api(self, request):
+        self.messages.append(dict(request.query))
+        return web.Response(text="OK")
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes([web.post("/api", self.handle_api)])
+        return app
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port, ssl_context=self.ssl_context)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def serve(args):
+    tanner = TannerStub(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        detections=parse_detections(args.detections),
+        payload_page=args.payload_page,
+        seed=args.seed,
+    )
+    await tanner.start(args.host, args.port)
+    print("tanner stub listening on {}:{}".format(args.host, tanner.port))
+    slurp = None
+    if args.slurp_port:
+        ssl_context = None
+        if args.slurp_cert:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(args.slurp_cert, args.slurp_key)
+        slurp = SlurpStub(ssl_context)
+        await slurp.start(args.host, args.slurp_port)
+        print("slurp stub listening on {}:{}".format(args.host, slurp.port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await tanner.stop()
+        if slurp is not None:
+            await slurp.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", help="host ip to bind to", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="port to listen on", default=8090)
+    parser.add_argument("--latency", type=float, help="delay of every tanner response in ms", default=0)
+    parser.add_argument("--jitter", type=float, help="random extra delay of up to this many ms", default=0)
+    parser.add_argument("--error-rate", type=float, help="fraction of tanner requests failing with 500", default=0)
+    parser.add_argument("--detections", help="mix of detection types, e.g. 1=0.8,2=0.15,3=0.05", default="1")
+    parser.add_argument("--payload-page", help="page type 2 payloads are injected into", default="/index.html")
+    parser.add_argument("--seed", type=int, help="seed of the latency, error and detection draws", default=None)
+    parser.add_argument("--slurp-port", type=int, help="port of the slurp stub, 0 to disable", default=0)
+    parser.add_argument("--slurp-cert", help="certificate of the slurp stub, snare talks HTTPS to slurp")
+    parser.add_argument("--slurp-key", help="private key of the slurp certificate")
+    args = parser.parse_args()
+    try:
+        asyncio.get_event_loop().run_until_complete(serve(args))
+    except KeyboardInterrupt:
+        pass